@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+import metrics
+
+# Admission control in front of the evaluation endpoints.
+# Every request is weighed by the work its PDF will cause (pages, and scanned pages
+# that need rendering and OCR cost more) and admitted only while the worker's total
+# and the user's own in-flight cost stay under their limits. Requests over the limit
+# wait in a bounded queue that is served round robin across users, so one user's
+# burst of scans cannot starve everyone else, or get a 429 with Retry-After at once.
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# cost units in flight per worker process, and per user_id within it
+ADMISSION_MAX_COST = int(os.getenv("ADMISSION_MAX_COST", "96"))
+ADMISSION_MAX_USER_COST = int(os.getenv("ADMISSION_MAX_USER_COST", "32"))
+# requests allowed to wait for capacity, beyond that they are rejected straight away
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# how long a queued request waits before it is rejected, 0 rejects without queueing
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "10"))
+# a page without a text layer is rendered and sent to Gemini
+ADMISSION_TEXT_PAGE_COST = int(os.getenv("ADMISSION_TEXT_PAGE_COST", "1"))
+ADMISSION_SCANNED_PAGE_COST = int(os.getenv("ADMISSION_SCANNED_PAGE_COST", "6"))
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+def estimate_cost(file_bytes):
+    # fonts are listed without extracting any text, a page without fonts has no text layer
+    import fitz
+    try:
+        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+            cost = 0
+            for page in doc:
+                scanned = not page.get_fonts() and bool(page.get_images())
+                cost += ADMISSION_SCANNED_PAGE_COST if scanned else ADMISSION_TEXT_PAGE_COST
+    except Exception:
+        # unreadable files fail fast in extraction, charge them as a single page
+        return ADMISSION_TEXT_PAGE_COST
+    return max(1, cost)
+
+
+class AdmissionController:
+    def __init__(self, max_cost=ADMISSION_MAX_COST, max_user_cost=ADMISSION_MAX_USER_COST,
+                 max_queue=ADMISSION_MAX_QUEUE, queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.max_cost = max_cost
+        self.max_user_cost = max_user_cost
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._per_user = Counter()
+        self._queues = OrderedDict()  # user -> deque of waiting tickets, in service order
+        self._waiting = 0
+        self.stats = Counter()
+
+    def _charge(self, cost):
+        # a request bigger than a whole limit may still run, alone
+        return min(cost, self.max_cost), min(cost, self.max_user_cost)
+
+    def _fits(self, user, cost):
+        total, own = self._charge(cost)
+        return (self._in_flight + total <= self.max_cost
+                and self._per_user[user] + own <= self.max_user_cost)
+
+    def _take(self, user, cost):
+        total, own = self._charge(cost)
+        self._in_flight += total
+        self._per_user[user] += own
+
+    def _next_ticket(self):
+        # first user, in round robin order, whose oldest request fits
+        for user, queue in self._queues.items():
+            ticket = queue[0]
+            if self._fits(user, ticket["cost"]):
+                return ticket
+        return None
+
+    def _acquire(self, user, cost, queue_timeout):
+        with self._cond:
+            if not self._queues and self._fits(user, cost):
+                self._take(user, cost)
+                self.stats["admitted"] += 1
+                return
+
+            if queue_timeout <= 0 or self._waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise Rejected("Server busy, try again later")
+
+            ticket = {"user": user, "cost": cost}
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._waiting += 1
+            deadline = time.monotonic() + queue_timeout
+            try:
+                while self._next_ticket() is not ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timed_out"] += 1
+                        raise Rejected("Server busy, queue wait timed out")
+                    self._cond.wait(remaining)
+                self._take(user, cost)
+                self.stats["admitted"] += 1
+                self.stats["queued"] += 1
+            finally:
+                queue = self._queues[user]
+                queue.remove(ticket)
+                if queue:
+                    # served users go to the back of the rotation
+                    self._queues.move_to_end(user)
+                else:
+                    del self._queues[user]
+                self._waiting -= 1
+                self._cond.notify_all()
+
+    def _release(self, user, cost):
+        total, own = self._charge(cost)
+        with self._cond:
+            self._in_flight -= total
+            self._per_user[user] -= own
+            if self._per_user[user] <= 0:
+                del self._per_user[user]
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, user, cost, queue_timeout=None):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        user = user or ""
+        queue_timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        with metrics.stage("admission"):
+            self._acquire(user, cost, queue_timeout)
+        try:
+            yield
+        finally:
+            self._release(user, cost)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "enabled": ADMISSION_ENABLED,
+                "in_flight_cost": self._in_flight,
+                "max_cost": self.max_cost,
+                "max_user_cost": self.max_user_cost,
+                "users_in_flight": len(self._per_user),
+                "waiting": self._waiting,
+                "max_queue": self.max_queue,
+                **self.stats,
+            }
+
+
+controller = AdmissionController()
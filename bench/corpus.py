@@ -0,0 +1,74 @@
+import os
+import random
+
+import fitz
+from faker import Faker
+
+# Synthetic resume corpus: text PDFs and image-only (scanned looking) PDFs
+
+fake = Faker()
+
+
+def resume_text():
+    lines = [
+        fake.name(),
+        f"{fake.email()} | {fake.phone_number()} | {fake.city()}",
+        "",
+        "SUMMARY",
+        fake.paragraph(nb_sentences=4),
+        "",
+        "EXPERIENCE",
+    ]
+    for _ in range(random.randint(2, 5)):
+        start = random.randint(2005, 2020)
+        lines.append(f"{fake.job()} - {fake.company()} ({start} - {start + random.randint(1, 4)})")
+        lines.extend(f"- {fake.sentence(nb_words=12)}" for _ in range(3))
+        lines.append("")
+    lines.append("SKILLS")
+    lines.append(", ".join(fake.words(nb=8)))
+    return "\n".join(lines)
+
+
+def text_pdf(pages=2):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=595, height=842)  # A4 in points
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), resume_text(), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def image_pdf(pages=2, dpi=150):
+    # render a text resume and keep only the picture of it, like a scanned CV
+    source = fitz.open(stream=text_pdf(pages), filetype="pdf")
+    doc = fitz.open()
+    zoom = dpi / 72
+    for src_page in source:
+        pix = src_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+        page = doc.new_page(width=src_page.rect.width, height=src_page.rect.height)
+        page.insert_image(page.rect, stream=pix.tobytes("png"))
+    source.close()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def build_corpus(count, image_ratio=0.3, seed=42):
+    random.seed(seed)
+    Faker.seed(seed)
+    corpus = []
+    for i in range(count):
+        pages = random.randint(1, 3)
+        if random.random() < image_ratio:
+            corpus.append((f"scanned_{i}.pdf", image_pdf(pages)))
+        else:
+            corpus.append((f"resume_{i}.pdf", text_pdf(pages)))
+    return corpus
+
+
+def write_corpus(corpus, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name, data in corpus:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
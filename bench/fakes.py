@@ -0,0 +1,150 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from faker import Faker
+
+# Local stand-ins for OpenAI, Gemini and the ResumeUpload API.
+# Each one sleeps for a log-normal latency and fails with a configurable probability,
+# which is close enough to what the real providers do for throughput comparisons.
+
+fake = Faker()
+_fake_lock = threading.Lock()
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+class LatencyModel:
+    def __init__(self, median_ms, sigma=0.35, error_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, name):
+        with self._lock:
+            delay = self._random.lognormvariate(0, self.sigma) * self.median_ms / 1000
+            failed = self._random.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise FakeServiceError(f"{name}: injected failure")
+
+
+def fake_evaluation():
+    # same field set the evaluation prompt asks for
+    with _fake_lock:
+        skills = random.sample(["Sales", "Python", "Excel", "Customer Service", "Project Management", "Team Leadership"], 5)
+        return {
+            "name": fake.name(),
+            "title": random.choice(["Software Engineer", "Retail Sales Executive", "Data Analyst", "Project Manager"]),
+            "job_desription": fake.text(max_nb_chars=300),
+            "email": fake.email(),
+            "company": fake.company(),
+            "past_company": [fake.company() for _ in range(3)],
+            "description": [fake.text(max_nb_chars=100) for _ in range(3)],
+            "past_title": [random.choice(["Sales Assistant", "Manager", "Trainer", "Executive"]) for _ in range(3)],
+            "current_description": fake.text(max_nb_chars=120),
+            "current_comp_year": random.randint(2010, 2024),
+            "current_comp_month": random.randint(1, 12),
+            "start_year": [random.randint(2000, 2015) for _ in range(3)],
+            "start_month": [random.randint(1, 12) for _ in range(3)],
+            "end_year": [random.randint(2016, 2024) for _ in range(3)],
+            "end_month": [random.randint(1, 12) for _ in range(3)],
+            "employment_type": random.choice(["permanent", "contract"]),
+            "location": fake.city(),
+            "phone_number": fake.phone_number(),
+            "skill": skills,
+            "proficiency": [random.randint(5, 10) for _ in skills],
+            "years_experience": [random.randint(1, 15) for _ in skills],
+            "last_used_year": [random.randint(2018, 2024) for _ in skills],
+            "percentage_match": random.randint(0, 100),
+            "short_description": fake.sentence(nb_words=15)
+        }
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAI:
+    # covers the part of the OpenAI client the service uses: client.responses.create(...)
+    def __init__(self, latency):
+        self.latency = latency
+        self.responses = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input, **kwargs):
+        self.latency.wait("openai")
+        output_text = json.dumps(fake_evaluation())
+        prompt_tokens = _estimate_tokens(input if isinstance(input, str) else json.dumps(input))
+        output_tokens = _estimate_tokens(output_text)
+        return SimpleNamespace(
+            output_text=output_text,
+            usage=SimpleNamespace(
+                input_tokens=prompt_tokens,
+                output_tokens=output_tokens,
+                total_tokens=prompt_tokens + output_tokens
+            )
+        )
+
+
+class FakeGeminiModel:
+    # replaces ocr.gemini_model, generate_content gets the prompt plus image parts
+    latency = None
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, **kwargs):
+        self.latency.wait("gemini")
+        images = [c for c in contents if isinstance(c, dict)]
+        with _fake_lock:
+            text = "\n".join(fake.text(max_nb_chars=1200) for _ in images)
+        # Gemini bills roughly 258 tokens per image tile
+        tokens = 258 * len(images) + _estimate_tokens(text)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(total_token_count=tokens)
+        )
+
+
+def make_gemini_model_class(latency):
+    return type("FakeGenerativeModel", (FakeGeminiModel,), {"latency": latency})
+
+
+class _UploadHandler(BaseHTTPRequestHandler):
+    latency = None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        try:
+            self.latency.wait("upload")
+        except FakeServiceError as e:
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(str(e).encode())
+            return
+
+        body = f"http://upload.local/resumes/{fake.uuid4()}.pdf".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_upload_server(latency, host="127.0.0.1", port=0):
+    handler = type("UploadHandler", (_UploadHandler,), {"latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_address[1]}/api/ResumeUpload/UploadFile"
+    return server, url
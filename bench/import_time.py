@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold start benchmark: how long a fresh interpreter takes to import the app.
+#
+#   python -m bench.import_time --runs 5 --target-ms 800
+#
+# Every run is a new process, so nothing is cached in sys.modules. The report has
+# the plain import (what a worker pays without preload) and import plus warm_up
+# (what the preloading master pays once), and the top level packages that dominate
+# according to -X importtime. Exits non-zero when the median import is over target.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+if {warm} and hasattr({module}, "warm_up"):
+    {module}.warm_up()
+print(imported - started, time.perf_counter() - started)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold import time of the service")
+    parser.add_argument("--module", default="flask1")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=1000, help="fail when the median import is slower")
+    parser.add_argument("--top", type=int, default=12, help="packages to list from -X importtime")
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+def run_probe(module, warm):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("GEMINI_API_KEY", "bench")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, warm=warm)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Import of {module} failed:\n{completed.stderr[-2000:]}")
+    imported, total = (float(v) for v in completed.stdout.split()[-2:])
+    return imported * 1000, total * 1000, completed.stderr
+
+
+def top_packages(importtime_log, module, count):
+    # lines look like "import time:   self |  cumulative | <indent>name", children are
+    # listed before their parent; the probed module has one space of indent and the
+    # modules it imports directly have three
+    cumulative = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        if name.startswith("   ") and not name.startswith("    "):
+            package = name.strip().split(".")[0]
+            cumulative[package] = cumulative.get(package, 0) + int(parts[1]) / 1000
+        elif name.startswith(" ") and not name.startswith("  "):
+            if name.strip() == module:
+                break
+            # a top level import of the interpreter itself (site, encodings, ...)
+            cumulative = {}
+    return sorted(cumulative.items(), key=lambda item: -item[1])[:count]
+
+
+def summarize(values):
+    return {
+        "median_ms": round(statistics.median(values), 1),
+        "min_ms": round(min(values), 1),
+        "max_ms": round(max(values), 1),
+    }
+
+
+def main():
+    args = parse_args()
+
+    cold = [run_probe(args.module, False) for _ in range(args.runs)]
+    warm = [run_probe(args.module, True) for _ in range(args.runs)]
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "target_ms": args.target_ms,
+        "import": summarize([imported for imported, _, _ in cold]),
+        "import_and_warm_up": summarize([total for _, total, _ in warm]),
+        "top_packages_ms": [
+            {"package": name, "cumulative_ms": round(ms, 1)}
+            for name, ms in top_packages(cold[-1][2], args.module, args.top)
+        ],
+    }
+
+    print(f"import {args.module}: median {report['import']['median_ms']} ms "
+          f"(min {report['import']['min_ms']}, max {report['import']['max_ms']}), target {args.target_ms} ms")
+    print(f"import + warm_up: median {report['import_and_warm_up']['median_ms']} ms")
+    print("slowest top level imports:")
+    for row in report["top_packages_ms"]:
+        print(f"  {row['package']:<30} {row['cumulative_ms']:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report["import"]["median_ms"] > args.target_ms:
+        print(f"❌ cold import is over the {args.target_ms} ms target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
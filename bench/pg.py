@@ -0,0 +1,83 @@
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg2
+
+# Throwaway PostgreSQL cluster for the benchmark, created with initdb in a temp
+# directory and listening on a unix socket only
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _bin_dir():
+    if shutil.which("initdb"):
+        return os.path.dirname(shutil.which("initdb"))
+    if shutil.which("pg_config"):
+        out = subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    candidates = sorted(glob.glob("/usr/lib/postgresql/*/bin"))
+    if candidates:
+        return candidates[-1]
+    raise RuntimeError("initdb not found, install PostgreSQL or run with --pg-from-env")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ThrowawayPostgres:
+    def __init__(self):
+        self.bin_dir = _bin_dir()
+        self.base = tempfile.mkdtemp(prefix="resume-bench-pg-")
+        self.data_dir = os.path.join(self.base, "data")
+        self.port = _free_port()
+
+    def _run(self, tool, *args):
+        subprocess.run([os.path.join(self.bin_dir, tool), *args], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def start(self):
+        self._run("initdb", "-D", self.data_dir, "-U", "bench", "-A", "trust", "--no-sync")
+        self._run(
+            "pg_ctl", "-D", self.data_dir, "-w", "-l", os.path.join(self.base, "postgres.log"),
+            "-o", f"-p {self.port} -k {self.base} -c listen_addresses='' -c fsync=off -c max_connections=200",
+            "start"
+        )
+        return self
+
+    def env(self):
+        # variables read by db.py
+        return {
+            "PG_HOST": self.base,
+            "PG_PORT": str(self.port),
+            "PG_NAME": "postgres",
+            "PG_USER": "bench",
+            "PG_PASSWORD": "''",
+        }
+
+    def stop(self):
+        try:
+            self._run("pg_ctl", "-D", self.data_dir, "-m", "immediate", "stop")
+        finally:
+            shutil.rmtree(self.base, ignore_errors=True)
+
+
+def apply_schema(dsn):
+    # benchmark copy of the app tables, then the repo migrations in order
+    files = [os.path.join(ROOT, "bench", "schema.sql")]
+    files += sorted(glob.glob(os.path.join(ROOT, "sql", "*.sql")))
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for path in files:
+                with open(path) as f:
+                    cursor.execute(f.read())
+    finally:
+        conn.close()
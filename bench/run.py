@@ -0,0 +1,228 @@
+import argparse
+import functools
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import corpus as corpus_mod
+from bench import fakes
+
+# Offline end-to-end benchmark for /evaluate-resume.
+#
+#   python -m bench.run --concurrency 1,4,16 --requests 64
+#
+# OpenAI, Gemini and the upload API are replaced by local fakes, Postgres by a
+# throwaway cluster (or the PG_* environment with --pg-from-env), and the service
+# runs in a threaded werkzeug server so requests go through real HTTP.
+
+STAGES = ["request", "upload", "extraction", "ocr", "llm", "db"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline /evaluate-resume benchmark")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--corpus-size", type=int, default=32)
+    parser.add_argument("--image-ratio", type=float, default=0.3, help="share of image-only PDFs")
+    parser.add_argument("--openai-ms", type=float, default=1500)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-ms", type=float, default=2500)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--upload-ms", type=float, default=300)
+    parser.add_argument("--upload-error-rate", type=float, default=0.0)
+    parser.add_argument("--sigma", type=float, default=0.35, help="log-normal spread of every fake latency")
+    parser.add_argument("--pg-from-env", action="store_true", help="use PG_* from the environment instead of a throwaway cluster")
+    parser.add_argument("--enable-cache", action="store_true", help="keep the evaluation cache and text store on")
+    parser.add_argument("--enable-rate-limit", action="store_true",
+                        help="keep the rate limiter on, with fresh buckets for this run")
+    parser.add_argument("--write-corpus", help="also write the generated PDFs to this directory")
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in KB on Linux, only the peak is available elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = {stage: [] for stage in STAGES}
+            self.errors = {stage: 0 for stage in STAGES}
+            self.peak_rss = {stage: 0 for stage in STAGES}
+
+    def record(self, stage, seconds, failed):
+        rss = current_rss()
+        with self._lock:
+            self.latencies[stage].append(seconds)
+            if failed:
+                self.errors[stage] += 1
+            self.peak_rss[stage] = max(self.peak_rss[stage], rss)
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self.record(stage, time.perf_counter() - started, failed)
+        return timed
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def summarize(recorder, wall_seconds, total_requests):
+    report = {
+        "requests_per_second": round(total_requests / wall_seconds, 2) if wall_seconds else None,
+        "wall_seconds": round(wall_seconds, 3),
+        "stages": {},
+    }
+    for stage in STAGES:
+        values = recorder.latencies[stage]
+        report["stages"][stage] = {
+            "count": len(values),
+            "errors": recorder.errors[stage],
+            "p50_ms": round(percentile(values, 50) * 1000, 1) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 1) if values else None,
+            "p99_ms": round(percentile(values, 99) * 1000, 1) if values else None,
+            "peak_rss_mb": round(recorder.peak_rss[stage] / 1024 / 1024, 1) if values else None,
+        }
+    return report
+
+
+def print_report(concurrency, report):
+    print(f"\n=== concurrency {concurrency}: {report['requests_per_second']} req/s over {report['wall_seconds']}s")
+    print(f"{'stage':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    for stage, s in report["stages"].items():
+        if not s["count"]:
+            continue
+        print(f"{stage:<12}{s['count']:>7}{s['errors']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['peak_rss_mb']:>13}")
+
+
+def main():
+    args = parse_args()
+
+    pg = None
+    if not args.pg_from_env:
+        from bench.pg import ThrowawayPostgres
+        pg = ThrowawayPostgres().start()
+        os.environ.update(pg.env())
+
+    upload_server, upload_url = fakes.start_upload_server(
+        fakes.LatencyModel(args.upload_ms, args.sigma, args.upload_error_rate)
+    )
+
+    # module level settings are read on import, so the environment goes first
+    os.environ["RESUME_UPLOAD_URL"] = upload_url
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    if not args.enable_cache:
+        os.environ["EVAL_CACHE_ENABLED"] = "false"
+        os.environ["TEXT_STORE_ENABLED"] = "false"
+    # the limiter's buckets are shared with any local server and outlive the run,
+    # a measurement never inherits their state
+    if args.enable_rate_limit:
+        os.environ["RATE_LIMIT_DB"] = os.path.join(tempfile.mkdtemp(prefix="bench_ratelimit_"), "ratelimit.sqlite3")
+    else:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    import db
+    import extraction
+    import flask1
+    import ocr
+    import persistence
+    from bench.pg import apply_schema
+    from werkzeug.serving import make_server
+
+    try:
+        apply_schema(db.pg_connection_string)
+
+        flask1.client = fakes.FakeOpenAI(fakes.LatencyModel(args.openai_ms, args.sigma, args.openai_error_rate))
+        ocr.gemini_model = fakes.make_gemini_model_class(
+            fakes.LatencyModel(args.gemini_ms, args.sigma, args.gemini_error_rate)
+        )
+
+        recorder = StageRecorder()
+        flask1.upload_resume_file = recorder.wrap("upload", flask1.upload_resume_file)
+        extraction.extract_text = recorder.wrap("extraction", extraction.extract_text)
+        ocr.ocr_document = recorder.wrap("ocr", ocr.ocr_document)
+        flask1.llm_evaluate = recorder.wrap("llm", flask1.llm_evaluate)
+        persistence.save_evaluation = recorder.wrap("db", persistence.save_evaluation)
+
+        print(f"Generating {args.corpus_size} synthetic resumes ({args.image_ratio:.0%} image-only)")
+        corpus = corpus_mod.build_corpus(args.corpus_size, args.image_ratio)
+        if args.write_corpus:
+            corpus_mod.write_corpus(corpus, args.write_corpus)
+
+        server = make_server("127.0.0.1", 0, flask1.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = f"http://127.0.0.1:{server.server_port}/evaluate-resume"
+
+        import requests
+        local = threading.local()
+
+        def send(i):
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            name, data = corpus[i % len(corpus)]
+            started = time.perf_counter()
+            response = session.post(endpoint, files={"file": (name, data, "application/pdf")}, data={
+                "job_desc": "Software Engineer with Python, SQL and cloud experience",
+                "user_id": "bench@local",
+                "job_name": "!##NOJOBNAME##!",
+                "id_MM_user": "bench",
+                "batch_id": batch_id,
+            })
+            recorder.record("request", time.perf_counter() - started, response.status_code != 200)
+
+        results = {}
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            recorder.reset()
+            batch_id = f"bench-{uuid.uuid4()}"
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(send, range(args.requests)))
+            report = summarize(recorder, time.perf_counter() - started, args.requests)
+            print_report(concurrency, report)
+            results[str(concurrency)] = report
+
+        server.shutdown()
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        upload_server.shutdown()
+        if pg is not None:
+            pg.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+-- Minimal copy of the application tables, enough for the benchmark's throwaway database.
+-- Only the columns written by flask1.py / persistence.py are declared.
+
+CREATE TABLE IF NOT EXISTS log_history_batch (
+    batch_id    TEXT PRIMARY KEY,
+    created_by  TEXT,
+    created_at  TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS LOG_HISTORY (
+    "LOG_HISTORY_ID"  TEXT PRIMARY KEY,
+    user_id           TEXT,
+    date_run          TIMESTAMPTZ,
+    title             TEXT,
+    job_description   TEXT,
+    file_url          TEXT,
+    name              TEXT,
+    email             TEXT,
+    phone_no          TEXT,
+    match_percentage  INTEGER,
+    short_desc        TEXT,
+    is_shortlisted    INTEGER,
+    gpt_token         INTEGER,
+    gemini_token      INTEGER,
+    match_acceptance  INTEGER,
+    batch_id          TEXT
+);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    candidate_id     TEXT PRIMARY KEY,
+    owner_email      TEXT,
+    full_name        TEXT,
+    current_company  TEXT,
+    notes            TEXT,
+    current_title    TEXT,
+    location         TEXT,
+    candidate_email  TEXT,
+    phone            TEXT,
+    resume_url       TEXT,
+    user_id          TEXT,
+    created_at       TIMESTAMPTZ DEFAULT now(),
+    updated_at       TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS candidate_skills (
+    id                BIGSERIAL PRIMARY KEY,
+    candidate_id      TEXT REFERENCES candidates (candidate_id),
+    skill_name        TEXT,
+    proficiency       TEXT,
+    years_experience  TEXT,
+    last_used_year    TEXT,
+    created_at        TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS candidate_experience (
+    id               BIGSERIAL PRIMARY KEY,
+    candidate_id     TEXT REFERENCES candidates (candidate_id),
+    company          TEXT,
+    title            TEXT,
+    description      TEXT,
+    start_year       INTEGER,
+    start_month      INTEGER,
+    end_year         INTEGER,
+    end_month        INTEGER,
+    employment_type  TEXT,
+    is_current       BOOLEAN DEFAULT FALSE,
+    created_at       TIMESTAMPTZ DEFAULT now(),
+    updated_at       TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS candidate_track (
+    id         BIGSERIAL PRIMARY KEY,
+    user_id    TEXT,
+    resume_id  TEXT
+);
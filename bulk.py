@@ -0,0 +1,711 @@
+import glob
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from psycopg2.extras import execute_values
+
+import eval_cache
+import evaluation_schema
+import jobs
+import metrics
+import persistence
+import prompts
+import ratelimit
+import uploader
+import db
+from db import get_connection, use_connection
+
+# Offline bulk screening through a provider batch API.
+# A run extracts the text of a whole folder (or of the queued jobs of a batch_id),
+# writes every evaluation prompt to one JSONL request file, submits it to a batch
+# provider, polls until the provider is done and streams the results into the usual
+# tables in chunks. Batch APIs trade latency for price and throughput: the requests
+# run within hours at a discount and outside the interactive rate limits.
+#
+# Run state lives in bulk_runs and bulk_run_items (one row per resume, marked once
+# its evaluation is stored); every stage can be resumed by `python bulk_screen.py
+# --watch` after a crash or redeploy, on any host. The request and output files are
+# scratch space under the runner's own BULK_WORK_DIR/<run_id>, rebuilt or downloaded
+# again when missing. Resumes uploaded through POST /bulk-runs wait in
+# evaluation_jobs (status 'bulk') until the run takes them, so the runner does not
+# need the web server's disk.
+
+BULK_WORK_DIR = os.getenv("BULK_WORK_DIR", os.path.join(tempfile.gettempdir(), "resume_bulk"))
+BULK_PROVIDER = os.getenv("BULK_PROVIDER", "openai")
+BULK_MODEL = os.getenv("BULK_MODEL", "gpt-5-nano")
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", "8"))
+BULK_POLL_INTERVAL = float(os.getenv("BULK_POLL_INTERVAL", "60"))
+# evaluations written per transaction while ingesting results
+BULK_SAVE_CHUNK = int(os.getenv("BULK_SAVE_CHUNK", "200"))
+# a run whose runner has not reported within this window is picked up by another one
+BULK_LOCK_TIMEOUT = int(os.getenv("BULK_LOCK_TIMEOUT", "1800"))
+BULK_ENDPOINT = "/v1/responses"
+
+# run status: pending -> extracting -> submitting -> submitted -> ingesting -> completed | failed
+# ("submitting" is recorded before the provider is called, so a run resumed from it
+# first looks for a batch it may already have paid for)
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS bulk_runs (
+        run_id             UUID PRIMARY KEY,
+        status             TEXT NOT NULL DEFAULT 'pending',
+        provider           TEXT NOT NULL,
+        provider_batch_id  TEXT,
+        params             JSONB NOT NULL,
+        work_dir           TEXT NOT NULL,
+        total              INTEGER NOT NULL DEFAULT 0,
+        requested          INTEGER NOT NULL DEFAULT 0,
+        succeeded          INTEGER NOT NULL DEFAULT 0,
+        failed             INTEGER NOT NULL DEFAULT 0,
+        last_error         TEXT,
+        locked_at          TIMESTAMPTZ,
+        locked_by          TEXT,
+        created_at         TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at         TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE TABLE IF NOT EXISTS bulk_run_items (
+        run_id       UUID NOT NULL,
+        custom_id    TEXT NOT NULL,
+        item         JSONB NOT NULL,
+        ingested_at  TIMESTAMPTZ,
+        PRIMARY KEY (run_id, custom_id)
+    );
+"""
+
+CLAIM_RUN_SQL = """
+    UPDATE bulk_runs
+    SET locked_at = now(),
+        locked_by = %s,
+        updated_at = now()
+    WHERE run_id = (
+        SELECT run_id FROM bulk_runs
+        WHERE status NOT IN ('completed', 'failed')
+          AND (locked_by IS NULL OR locked_at < now() - make_interval(secs => %s))
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING run_id
+"""
+
+RUN_COLUMNS = ("run_id", "status", "provider", "provider_batch_id", "params", "work_dir", "total",
+               "requested", "succeeded", "failed", "last_error", "created_at", "updated_at")
+
+
+class BulkRunFailed(Exception):
+    # the run cannot finish, as opposed to an outage it can be resumed from
+    pass
+
+
+def ensure_schema():
+    db.ensure_schema(CREATE_TABLE_SQL)
+
+
+def run_owner(run_id):
+    # locked_by of the evaluation_jobs reserved for a run
+    return f"bulk:{run_id}"
+
+
+def _work_dir(run_id):
+    # always local to the runner, whatever host created the run
+    work_dir = os.path.join(BULK_WORK_DIR, run_id)
+    os.makedirs(work_dir, exist_ok=True)
+    return work_dir
+
+
+def _paths(work_dir):
+    return {
+        "requests": os.path.join(work_dir, "requests.jsonl"),
+        "output": os.path.join(work_dir, "output.jsonl"),
+    }
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# Providers
+# submit(requests_path, run_id) -> provider batch id, tagged with the run id
+# find(run_id, since) -> id of a batch already submitted for the run since that
+#   unix time, or None
+# poll(batch_id) -> "running", "completed" or "failed"
+# download(batch_id, output_path) writes the results, one JSON object per line:
+#   {"custom_id": ..., "response": {"status_code": 200, "body": {...}}, "error": null}
+
+class OpenAIBatchProvider:
+    # OpenAI Batch API, results within 24h at about half the price of interactive calls
+    DONE = ("completed", "expired")  # an expired batch still returns what it finished
+    FAILED = ("failed", "cancelled", "cancelling")
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import flask1
+            self._client = flask1.get_client()
+        return self._client
+
+    def submit(self, requests_path, run_id):
+        with open(requests_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BULK_ENDPOINT,
+            completion_window="24h",
+            metadata={"run_id": run_id}
+        )
+        return batch.id
+
+    def find(self, run_id, since):
+        # newest first, nothing older than the run can belong to it
+        for batch in self.client.batches.list(limit=100):
+            if batch.created_at < since:
+                break
+            if (batch.metadata or {}).get("run_id") == run_id:
+                return batch.id
+        return None
+
+    def poll(self, batch_id):
+        status = self.client.batches.retrieve(batch_id).status
+        if status in self.DONE:
+            return "completed"
+        if status in self.FAILED:
+            return "failed"
+        return "running"
+
+    def download(self, batch_id, output_path):
+        batch = self.client.batches.retrieve(batch_id)
+        with open(output_path, "wb") as f:
+            # failed requests are reported in a separate error file, same line format
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    f.write(self.client.files.content(file_id).read())
+
+
+class LocalBatchProvider:
+    # File based stand-in for a batch API, for tests, the benchmark and providers
+    # without one. submit copies the request file, the first poll answers every
+    # request through complete(body) -> (output_text, total_tokens) and writes the
+    # output file in the OpenAI format. By default requests go to the interactive
+    # OpenAI API, through the shared rate limiter.
+
+    def __init__(self, complete=None, root=None):
+        self.complete = complete or self._complete_with_openai
+        self.root = root or os.path.join(BULK_WORK_DIR, "local_batches")
+
+    def _complete_with_openai(self, body):
+        import flask1
+        response = ratelimit.call(
+            "openai",
+            lambda: flask1.get_client().responses.create(**body),
+            prompts.estimate_tokens(body["input"]) + ratelimit.OPENAI_OUTPUT_TOKENS,
+            usage=lambda r: r.usage.total_tokens
+        )
+        return response.output_text, response.usage.total_tokens
+
+    def _dir(self, batch_id):
+        return os.path.join(self.root, batch_id)
+
+    def submit(self, requests_path, run_id):
+        batch_id = f"local-{run_id}"
+        os.makedirs(self._dir(batch_id), exist_ok=True)
+        input_path = os.path.join(self._dir(batch_id), "input.jsonl")
+        shutil.copyfile(requests_path, input_path + ".part")
+        os.replace(input_path + ".part", input_path)
+        return batch_id
+
+    def find(self, run_id, since):
+        batch_id = f"local-{run_id}"
+        return batch_id if os.path.exists(os.path.join(self._dir(batch_id), "input.jsonl")) else None
+
+    def poll(self, batch_id):
+        output_path = os.path.join(self._dir(batch_id), "output.jsonl")
+        if not os.path.exists(output_path):
+            partial = output_path + ".part"
+            with open(partial, "w", encoding="utf-8") as out:
+                for request in _read_jsonl(os.path.join(self._dir(batch_id), "input.jsonl")):
+                    try:
+                        text, tokens = self.complete(request["body"])
+                        line = {
+                            "custom_id": request["custom_id"],
+                            "response": {
+                                "status_code": 200,
+                                "body": {"output_text": text, "usage": {"total_tokens": tokens}}
+                            },
+                            "error": None
+                        }
+                    except Exception as e:
+                        line = {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+                    out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            os.replace(partial, output_path)
+        return "completed"
+
+    def download(self, batch_id, output_path):
+        shutil.copyfile(os.path.join(self._dir(batch_id), "output.jsonl"), output_path)
+
+
+# name -> factory returning a provider
+PROVIDERS = {
+    "openai": OpenAIBatchProvider,
+    "local": LocalBatchProvider,
+}
+
+
+def register_provider(name, factory):
+    PROVIDERS[name] = factory
+
+
+def get_provider(name):
+    if name not in PROVIDERS:
+        raise BulkRunFailed(f"Unknown bulk provider: {name}")
+    return PROVIDERS[name]()
+
+
+# Runs
+
+def create_run(params, provider=None, run_id=None, conn=None):
+    # params: job_desc, user_id, job_name, id_MM_user, batch_id, acceptance, upload and
+    # the source, folder or source_batch_id; with conn the run joins the caller's
+    # transaction, e.g. the one storing its files
+    provider = provider or BULK_PROVIDER
+    get_provider(provider)
+    ensure_schema()
+    run_id = run_id or str(uuid.uuid4())
+    # the runner that takes the run records its own work_dir
+    with use_connection(conn) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO bulk_runs (run_id, provider, params, work_dir)
+                VALUES (%s, %s, %s::jsonb, %s)
+            """, (run_id, provider, json.dumps(params), ""))
+    return run_id
+
+
+def get_run(run_id):
+    ensure_schema()
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(RUN_COLUMNS)} FROM bulk_runs WHERE run_id = %s", (run_id,))
+            row = cursor.fetchone()
+    if row is None:
+        return None
+    run = dict(zip(RUN_COLUMNS, row))
+    run["run_id"] = str(run["run_id"])
+    return run
+
+
+def _update(run_id, **fields):
+    # every update also renews the runner's lock
+    assignments = ", ".join(f"{name} = %s" for name in fields)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE bulk_runs
+                SET {assignments}{", " if fields else ""}locked_at = now(), updated_at = now()
+                WHERE run_id = %s
+            """, (*fields.values(), run_id))
+
+
+def claim_run(runner_id):
+    ensure_schema()
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CLAIM_RUN_SQL, (runner_id, BULK_LOCK_TIMEOUT))
+            row = cursor.fetchone()
+    return str(row[0]) if row else None
+
+
+def _documents(run, owner):
+    # (filename, load() -> bytes, job or None) for every document of the run
+    params = run["params"]
+    if params.get("source_batch_id"):
+        for job in jobs.claim_batch(params["source_batch_id"], owner):
+            yield job["filename"], (lambda job_id=job["job_id"]: jobs.get_file(job_id)), job
+        return
+
+    folder = params["folder"]
+    paths = [p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+             if os.path.isfile(p) and p.lower().endswith(".pdf")]
+    for path in sorted(paths):
+        yield os.path.relpath(path, folder), (lambda path=path: open(path, "rb").read()), None
+
+
+def _prepare_item(params, custom_id, filename, load, job):
+    import flask1
+    item = {"custom_id": custom_id, "filename": filename}
+    if job:
+        item["job"] = {k: job[k] for k in ("job_id", "attempts", "max_attempts")}
+
+    try:
+        file_bytes = load()
+        if not file_bytes:
+            raise ValueError("File is empty or no longer stored")
+        file_hash = eval_cache.hash_bytes(file_bytes)
+        item["file_hash"] = file_hash
+
+        url = None
+        if params.get("upload", True):
+            url = uploader.submit(flask1.upload_resume_file, file_bytes, filename)
+
+        cached = eval_cache.get(eval_cache.make_key(
+            file_hash, params["job_desc"], params["job_name"], params["acceptance"]))
+        metrics.cache_event("evaluation", cached is not None)
+
+        request = None
+        if cached is not None:
+            item["cached"] = cached
+        else:
+            resume, item["gemini_tokens"] = flask1.extract_resume_text(file_bytes, file_hash)
+            prompt, _, _ = flask1.build_prompt(resume, params["job_desc"], params["acceptance"])
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BULK_ENDPOINT,
+                "body": {"model": BULK_MODEL, "input": prompt}
+            }
+
+        if url is not None:
+            try:
+                item["file_url"] = url.result()
+            except Exception as e:
+                print(f"⚠️ Bulk upload failed for {filename}: {e}")
+                item["file_url"] = None
+        return item, request
+
+    except Exception as e:
+        print(f"❌ Bulk extraction failed for {filename}: {e}")
+        traceback.print_exc()
+        item["error"] = str(e)
+        return item, None
+
+
+def _save_items(run_id, items):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO bulk_run_items (run_id, custom_id, item)
+                VALUES %s
+                ON CONFLICT (run_id, custom_id) DO UPDATE SET item = EXCLUDED.item, ingested_at = NULL
+            """, [(run_id, item["custom_id"], json.dumps(item, ensure_ascii=False, default=str)) for item in items],
+                template="(%s, %s, %s::jsonb)")
+
+
+def _load_items(run_id):
+    # (manifest by custom_id, custom_ids already stored)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT item, ingested_at IS NOT NULL FROM bulk_run_items WHERE run_id = %s
+            """, (run_id,))
+            rows = cursor.fetchall()
+    manifest = {item["custom_id"]: item for item, _ in rows}
+    done = {item["custom_id"] for item, ingested in rows if ingested}
+    return manifest, done
+
+
+def prepare(run, owner, work_dir):
+    paths = _paths(work_dir)
+    params = dict(run["params"])
+    documents = list(_documents(run, owner))
+
+    # a source batch carries its own request fields, the run only names the batch
+    for _, _, job in documents[:1]:
+        if job:
+            for key, value in job["params"].items():
+                params.setdefault(key, value)
+    params.setdefault("job_name", "!##NOJOBNAME##!")
+    params.setdefault("acceptance", 70)
+
+    # an interrupted extraction starts over, nothing of it was submitted or stored yet
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM bulk_run_items WHERE run_id = %s", (run["run_id"],))
+
+    total = requested = 0
+    pending = []
+    with open(paths["requests"], "w", encoding="utf-8") as requests_file, \
+            ThreadPoolExecutor(max_workers=BULK_EXTRACT_WORKERS) as executor:
+        futures = [
+            executor.submit(_prepare_item, params, f"r{i}", filename, load, job)
+            for i, (filename, load, job) in enumerate(documents)
+        ]
+        for future in as_completed(futures):
+            item, request = future.result()
+            pending.append(item)
+            total += 1
+            if request is not None:
+                requests_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+                requested += 1
+            if len(pending) >= 50:
+                _save_items(run["run_id"], pending)
+                pending = []
+                _update(run["run_id"], total=total, requested=requested)
+    if pending:
+        _save_items(run["run_id"], pending)
+
+    if os.path.exists(paths["output"]):
+        os.remove(paths["output"])
+
+    _update(run["run_id"], params=json.dumps(params), total=total, requested=requested)
+    run["params"] = params
+    return requested
+
+
+def _parse_result(line):
+    # returns (output_text, tokens, error)
+    if line.get("error"):
+        return None, 0, str(line["error"].get("message") if isinstance(line["error"], dict) else line["error"])
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        return None, 0, f"Provider status {response.get('status_code')}: {body.get('error')}"
+
+    tokens = (body.get("usage") or {}).get("total_tokens", 0)
+    text = body.get("output_text")
+    if text is None:
+        # raw Responses API object: output -> message -> output_text parts
+        text = "".join(
+            part.get("text", "")
+            for output in body.get("output") or []
+            if output.get("type") == "message"
+            for part in output.get("content") or []
+            if part.get("type") == "output_text"
+        )
+    return text, tokens, None
+
+
+def _results(output_path, manifest, no_description):
+    # (item, data, openai_tokens, error) for every item: cached and failed ones from the
+    # manifest, the rest from the provider output, anything the provider dropped last
+    answered = set()
+    for item in manifest.values():
+        if "cached" in item:
+            answered.add(item["custom_id"])
+            yield item, item["cached"], 0, None
+        elif "error" in item:
+            answered.add(item["custom_id"])
+            yield item, None, 0, item["error"]
+
+    for line in _read_jsonl(output_path):
+        item = manifest.get(line.get("custom_id"))
+        if item is None or item["custom_id"] in answered:
+            continue
+        answered.add(item["custom_id"])
+        text, tokens, error = _parse_result(line)
+        if error:
+            yield item, None, tokens, error
+            continue
+        try:
+            data, _ = evaluation_schema.repair(text)
+        except ValueError:
+            yield item, None, tokens, f"Invalid JSON response: {text}"
+            continue
+        # no interactive re-ask in bulk, incomplete answers are left for a normal retry
+        missing = evaluation_schema.missing_fields(data, no_description)
+        if missing:
+            yield item, None, tokens, f"Response is missing {', '.join(missing)}"
+            continue
+        yield item, evaluation_schema.normalize(data), tokens, None
+
+    for item in manifest.values():
+        if item["custom_id"] not in answered:
+            yield item, None, 0, "No result from the provider"
+
+
+def _finish_items(conn, run_id, evaluated, chunk):
+    # job updates, progress and counters commit with the evaluations themselves,
+    # so a resumed ingest never stores a chunk twice
+    for item, data in evaluated:
+        if item.get("job"):
+            jobs.complete(item["job"]["job_id"], data, conn=conn)
+    failed = 0
+    for item, _, _, error in chunk:
+        if error is not None:
+            failed += 1
+            print(f"❌ Bulk item {item['filename']} failed: {error}")
+            if item.get("job"):
+                jobs.fail(item["job"], error, conn=conn)
+
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE bulk_run_items SET ingested_at = now()
+            WHERE run_id = %s AND custom_id = ANY(%s)
+        """, (run_id, [item["custom_id"] for item, *_ in chunk]))
+        cursor.execute("""
+            UPDATE bulk_runs
+            SET succeeded = succeeded + %s, failed = failed + %s, locked_at = now(), updated_at = now()
+            WHERE run_id = %s
+        """, (len(evaluated), failed, run_id))
+
+
+def _flush(run, params, chunk):
+    import flask1
+    no_description = params["job_desc"] == prompts.NO_DESCRIPTION
+    evaluated = []
+    for item, data, tokens, error in chunk:
+        if error is None:
+            cache_hit = "cached" in item
+            if not cache_hit:
+                # the model may only have seen the job profile, keep the description verbatim
+                if not no_description:
+                    data["job_desription"] = params["job_desc"]
+                eval_cache.put(eval_cache.make_key(
+                    item["file_hash"], params["job_desc"], params["job_name"], params["acceptance"]), data)
+            data = dict(data)
+            flask1.stamp_evaluation(data, params.get("user_id"), item.get("file_url"), item.get("gemini_tokens", 0),
+                                    tokens, cache_hit, item["filename"], params["acceptance"], params["job_name"],
+                                    no_description)
+            evaluated.append((item, data))
+
+    try:
+        with metrics.stage("db"), get_connection() as conn:
+            persistence.save_evaluations(conn, [
+                {
+                    "data": data,
+                    "batch_id": params.get("batch_id"),
+                    "id_MM_user": params.get("id_MM_user"),
+                    "no_description": no_description
+                }
+                for _, data in evaluated
+            ])
+            _finish_items(conn, run["run_id"], evaluated, chunk)
+        return
+    except Exception as e:
+        print(f"❌ Bulk save error: {e}")
+        traceback.print_exc()
+        error = f"Evaluation not saved: {e}"
+
+    # the chunk is recorded as failed instead, an outage here interrupts the run
+    chunk = [(item, None, 0, error) if item_error is None else (item, data, tokens, item_error)
+             for item, data, tokens, item_error in chunk]
+    with get_connection() as conn:
+        _finish_items(conn, run["run_id"], [], chunk)
+
+
+def ingest(run, work_dir):
+    params = run["params"]
+    manifest, done = _load_items(run["run_id"])
+    no_description = params.get("job_desc") == prompts.NO_DESCRIPTION
+
+    chunk = []
+    for result in _results(_paths(work_dir)["output"], manifest, no_description):
+        if result[0]["custom_id"] in done:
+            continue
+        chunk.append(result)
+        if len(chunk) >= BULK_SAVE_CHUNK:
+            _flush(run, params, chunk)
+            chunk = []
+    if chunk:
+        _flush(run, params, chunk)
+
+    _update(run["run_id"], status="completed")
+
+
+def run_bulk(run_id, runner_id=None):
+    # drives a run from wherever it stopped to completed or failed
+    runner_id = runner_id or f"{socket.gethostname()}:{os.getpid()}"
+    owner = run_owner(run_id)
+    run = get_run(run_id)
+    if run is None:
+        raise ValueError(f"Unknown bulk run {run_id}")
+    _update(run_id, locked_by=runner_id, work_dir=_work_dir(run_id))
+
+    try:
+        provider = get_provider(run["provider"])
+
+        if run["status"] in ("pending", "extracting"):
+            _update(run_id, status="extracting")
+            work_dir = _work_dir(run_id)
+            requested = prepare(run, owner, work_dir)
+            _update(run_id, status="submitting" if requested else "ingesting")
+            run = get_run(run_id)
+
+        if run["status"] == "submitting":
+            work_dir = _work_dir(run_id)
+            requests_path = _paths(work_dir)["requests"]
+            # a crash between the provider accepting the batch and the update below
+            # must not pay for the same requests twice
+            batch_id = provider.find(run_id, run["created_at"].timestamp())
+            if batch_id is None:
+                if not os.path.exists(requests_path):
+                    # prepared by a runner on another host, the request file is rebuilt
+                    prepare(run, owner, work_dir)
+                batch_id = provider.submit(requests_path, run_id)
+            _update(run_id, status="submitted", provider_batch_id=batch_id)
+            print(f"📦 Bulk run {run_id}: {run['requested']} requests submitted as {batch_id}")
+            run = get_run(run_id)
+
+        if run["status"] == "submitted":
+            work_dir = _work_dir(run_id)
+            while True:
+                try:
+                    state = provider.poll(run["provider_batch_id"])
+                except Exception as e:
+                    # the batch keeps running on the provider side, just ask again later
+                    print(f"⚠️ Bulk run {run_id} poll failed: {e}")
+                    state = "running"
+                if state == "completed":
+                    provider.download(run["provider_batch_id"], _paths(work_dir)["output"])
+                    _update(run_id, status="ingesting")
+                    break
+                if state == "failed":
+                    raise BulkRunFailed(f"Provider batch {run['provider_batch_id']} failed")
+                _update(run_id)
+                time.sleep(BULK_POLL_INTERVAL)
+            run = get_run(run_id)
+
+        if run["status"] == "ingesting":
+            work_dir = _work_dir(run_id)
+            output_path = _paths(work_dir)["output"]
+            # another runner, or a cleaned up disk, fetches the results again
+            if run["provider_batch_id"] and not os.path.exists(output_path):
+                provider.download(run["provider_batch_id"], output_path)
+            ingest(run, work_dir)
+
+    except BulkRunFailed as e:
+        print(f"❌ Bulk run {run_id} failed: {e}")
+        _update(run_id, status="failed", last_error=str(e))
+        # resumes not evaluated go back to the normal queue
+        jobs.release(owner, f"Bulk run failed: {e}")
+        raise
+    except Exception as e:
+        # database or provider outage, the run resumes from this stage later
+        print(f"❌ Bulk run {run_id} interrupted: {e}")
+        traceback.print_exc()
+        _update(run_id, last_error=str(e))
+        raise
+    finally:
+        _update(run_id, locked_by=None)
+
+    return get_run(run_id)
+
+
+def watch(runner_id=None, stop_event=None):
+    # picks up pending runs, and runs abandoned by a crashed runner, one at a time
+    runner_id = runner_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            run_id = claim_run(runner_id)
+            if run_id is None:
+                stop_event.wait(BULK_POLL_INTERVAL)
+                continue
+            run_bulk(run_id, runner_id)
+        except Exception:
+            traceback.print_exc()
+            stop_event.wait(BULK_POLL_INTERVAL)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import uuid
+
+import bulk
+
+# Offline bulk screening through a provider batch API, see bulk.py
+#   python bulk_screen.py --folder ./archive --job-desc-file job.txt --user-id hr@example.com
+#   python bulk_screen.py --source-batch-id <batch_id>
+#   python bulk_screen.py --run-id <run_id>     resume a run
+#   python bulk_screen.py --watch               process runs created through POST /bulk-runs
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Screen a folder or a batch of resumes in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--folder", help="every PDF under this folder")
+    source.add_argument("--source-batch-id", help="the queued jobs of this batch_id")
+    source.add_argument("--run-id", help="resume an existing run")
+    source.add_argument("--watch", action="store_true", help="keep processing pending runs")
+    parser.add_argument("--job-desc")
+    parser.add_argument("--job-desc-file")
+    parser.add_argument("--job-name")
+    parser.add_argument("--user-id")
+    parser.add_argument("--id-mm-user")
+    parser.add_argument("--batch-id", help="batch the evaluations are stored under, new by default")
+    parser.add_argument("--acceptance", type=int, help="70 unless the source batch sets it")
+    parser.add_argument("--provider", default=bulk.BULK_PROVIDER, choices=sorted(bulk.PROVIDERS))
+    parser.add_argument("--no-upload", action="store_true", help="do not send the files to the upload API")
+    args = parser.parse_args()
+
+    if args.watch:
+        print("Watching for bulk runs")
+        bulk.watch()
+        raise SystemExit(0)
+
+    run_id = args.run_id
+    if run_id is None:
+        job_desc = args.job_desc
+        if args.job_desc_file:
+            with open(args.job_desc_file, encoding="utf-8") as f:
+                job_desc = f.read()
+        if args.folder and not job_desc:
+            parser.error("--folder needs --job-desc or --job-desc-file")
+        if args.folder and not os.path.isdir(args.folder):
+            parser.error(f"{args.folder} is not a folder")
+
+        params = {
+            "job_desc": job_desc,
+            "user_id": args.user_id,
+            "job_name": args.job_name,
+            "id_MM_user": args.id_mm_user,
+            "batch_id": args.batch_id or (None if args.source_batch_id else str(uuid.uuid4())),
+            "acceptance": args.acceptance,
+            "upload": False if args.no_upload else None,
+            "folder": os.path.abspath(args.folder) if args.folder else None,
+            "source_batch_id": args.source_batch_id,
+        }
+        # unset fields are filled from the source batch's jobs
+        run_id = bulk.create_run({k: v for k, v in params.items() if v is not None}, args.provider)
+        print(f"Created bulk run {run_id}")
+
+    run = bulk.run_bulk(run_id)
+    print(f"Bulk run {run_id} {run['status']}: {run['total']} resumes, {run['requested']} sent to the provider, "
+          f"{run['succeeded']} stored, {run['failed']} failed")
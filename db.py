@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# PostgreSQL Connection String
+pg_connection_string = f"""
+    host={os.getenv("PG_HOST")}
+    port={os.getenv("PG_PORT")}
+    dbname={os.getenv("PG_NAME")}
+    user={os.getenv("PG_USER")}
+    password={os.getenv("PG_PASSWORD")}
+"""
+
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# One pool per process. gunicorn forks workers after import, and a socket shared
+# between parent and child corrupts both sessions, so the pool is rebuilt when
+# the pid changes instead of being inherited.
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = None
+
+stats = {
+    "checkouts": 0,
+    "timeouts": 0,
+    "discarded": 0,
+    "in_use": 0,
+    "max_in_use": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _lock:
+        if _pool is None or _pool_pid != pid:
+            # do not closeall() an inherited pool, that would close the parent's sockets
+            _pool = pool.ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, pg_connection_string)
+            _slots = threading.BoundedSemaphore(PG_POOL_MAX)
+            _pool_pid = pid
+            stats["in_use"] = 0
+    return _pool
+
+
+def _record_wait(waited):
+    with _lock:
+        stats["checkouts"] += 1
+        stats["in_use"] += 1
+        stats["max_in_use"] = max(stats["max_in_use"], stats["in_use"])
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+
+def warm_pool():
+    # called from the gunicorn post_fork hook so the first request does not pay the handshake
+    try:
+        _get_pool()
+    except psycopg2.Error as e:
+        # never keep a worker from booting, the next checkout will try again
+        print(f"❌ PostgreSQL pool warm-up failed: {e}")
+
+
+@contextmanager
+def get_connection():
+    conn_pool = _get_pool()
+    slots = _slots
+
+    # ThreadedConnectionPool raises straight away when exhausted, the semaphore
+    # turns that into a bounded wait
+    started = time.monotonic()
+    if not slots.acquire(timeout=PG_POOL_TIMEOUT):
+        with _lock:
+            stats["timeouts"] += 1
+        raise PoolTimeout(f"No PostgreSQL connection available after {PG_POOL_TIMEOUT}s")
+
+    try:
+        conn = conn_pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+    _record_wait(time.monotonic() - started)
+
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+        raise
+    finally:
+        broken = broken or conn.closed != 0
+        if broken:
+            with _lock:
+                stats["discarded"] += 1
+        conn_pool.putconn(conn, close=broken)
+        slots.release()
+        with _lock:
+            stats["in_use"] -= 1
+
+
+@contextmanager
+def use_connection(conn=None):
+    # joins the caller's transaction when one is given, otherwise a pooled connection
+    if conn is not None:
+        yield conn
+        return
+    with get_connection() as conn:
+        yield conn
+
+
+# CREATE ... IF NOT EXISTS is not safe to run concurrently, two sessions creating the
+# same table can fail with a unique violation on pg_type; the thread lock covers this
+# process and the advisory lock the other workers
+SCHEMA_LOCK_KEY = 72150001
+_schema_lock = threading.Lock()
+_schemas_ready = set()
+
+
+def ensure_schema(create_sql):
+    if create_sql in _schemas_ready:
+        return
+    with _schema_lock:
+        if create_sql in _schemas_ready:
+            return
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_KEY,))
+                cursor.execute(create_sql)
+        _schemas_ready.add(create_sql)
+
+
+def get_stats():
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["min_size"] = PG_POOL_MIN
+    snapshot["max_size"] = PG_POOL_MAX
+    snapshot["timeout_seconds"] = PG_POOL_TIMEOUT
+    snapshot["wait_seconds_avg"] = round(snapshot["wait_seconds_total"] / snapshot["checkouts"], 6) if snapshot["checkouts"] else 0.0
+    return snapshot
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+
+from db import ensure_schema, get_connection
+from memory_cache import MemoryLRU
+
+# Bump when the evaluation prompt changes so stale answers are not served
+CACHE_VERSION = "v3"
+
+EVAL_CACHE_ENABLED = os.getenv("EVAL_CACHE_ENABLED", "true").lower() == "true"
+EVAL_CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "1024"))
+EVAL_CACHE_TTL_SECONDS = int(os.getenv("EVAL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+EVAL_CACHE_PURGE_INTERVAL = int(os.getenv("EVAL_CACHE_PURGE_INTERVAL", "3600"))
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS evaluation_cache (
+        cache_key   TEXT PRIMARY KEY,
+        evaluation  JSONB NOT NULL,
+        created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+        expires_at  TIMESTAMPTZ NOT NULL,
+        hit_count   INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS evaluation_cache_expires_at_idx
+        ON evaluation_cache (expires_at);
+"""
+
+_lock = threading.Lock()
+_memory = MemoryLRU(EVAL_CACHE_MAX_ENTRIES)  # cache_key -> json string
+_last_purge = 0.0
+
+stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "puts": 0,
+    "errors": 0,
+}
+
+
+def hash_bytes(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(file_hash, job_desc, job_name, acceptance):
+    # job fields are hashed together with the document so two jobs never share an answer
+    payload = json.dumps(
+        [CACHE_VERSION, file_hash, job_desc or "", job_name or "", str(acceptance)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _incr(name):
+    with _lock:
+        stats[name] += 1
+
+
+def get(cache_key):
+    if not EVAL_CACHE_ENABLED:
+        return None
+
+    payload = _memory.get(cache_key)
+    if payload is not None:
+        _incr("memory_hits")
+        return json.loads(payload)
+
+    try:
+        ensure_schema(CREATE_TABLE_SQL)
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE evaluation_cache
+                    SET hit_count = hit_count + 1
+                    WHERE cache_key = %s AND expires_at > now()
+                    RETURNING evaluation::text, EXTRACT(EPOCH FROM expires_at)
+                """, (cache_key,))
+                row = cursor.fetchone()
+    except Exception:
+        # the cache must never fail an evaluation, fall through to the LLM
+        _incr("errors")
+        traceback.print_exc()
+        return None
+
+    if row is None:
+        _incr("misses")
+        return None
+
+    payload, expires_at = row
+    _memory.put(cache_key, payload, float(expires_at))
+    _incr("db_hits")
+    return json.loads(payload)
+
+
+def put(cache_key, evaluation):
+    global _last_purge
+
+    if not EVAL_CACHE_ENABLED:
+        return
+
+    payload = json.dumps(evaluation, ensure_ascii=False, default=str)
+    _memory.put(cache_key, payload, time.time() + EVAL_CACHE_TTL_SECONDS)
+    _incr("puts")
+
+    try:
+        ensure_schema(CREATE_TABLE_SQL)
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO evaluation_cache (cache_key, evaluation, expires_at)
+                    VALUES (%s, %s::jsonb, now() + make_interval(secs => %s))
+                    ON CONFLICT (cache_key) DO UPDATE
+                    SET evaluation = EXCLUDED.evaluation,
+                        created_at = now(),
+                        expires_at = EXCLUDED.expires_at
+                """, (cache_key, payload, EVAL_CACHE_TTL_SECONDS))
+
+                # expired rows are dropped at most once per interval per worker
+                if time.time() - _last_purge > EVAL_CACHE_PURGE_INTERVAL:
+                    _last_purge = time.time()
+                    cursor.execute("DELETE FROM evaluation_cache WHERE expires_at <= now()")
+    except Exception:
+        _incr("errors")
+        traceback.print_exc()
+
+
+def get_stats():
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["evictions"] = _memory.evictions
+    snapshot["memory_entries"] = len(_memory)
+    lookups = snapshot["memory_hits"] + snapshot["db_hits"] + snapshot["misses"]
+    snapshot["hit_ratio"] = round((snapshot["memory_hits"] + snapshot["db_hits"]) / lookups, 4) if lookups else 0.0
+    snapshot["enabled"] = EVAL_CACHE_ENABLED
+    snapshot["max_entries"] = EVAL_CACHE_MAX_ENTRIES
+    snapshot["ttl_seconds"] = EVAL_CACHE_TTL_SECONDS
+    return snapshot
@@ -0,0 +1,266 @@
+import json
+import re
+
+# Schema of the evaluation JSON returned by the LLM.
+# repair() turns slightly malformed output (markdown fences, trailing commas, a
+# response cut off mid array) into a dict without another model call, normalize()
+# coerces every field to the type persistence.py expects and lines up the parallel
+# lists, so one bad field no longer throws away the whole evaluation.
+
+TEXT = "text"
+INT = "int"
+MONTH = "month"
+TEXT_LIST = "text_list"
+INT_LIST = "int_list"
+MONTH_LIST = "month_list"
+VALUE_LIST = "value_list"
+
+FIELDS = {
+    "name": TEXT,
+    "title": TEXT,
+    "job_desription": TEXT,
+    "email": TEXT,
+    "company": TEXT,
+    "past_company": TEXT_LIST,
+    "description": TEXT_LIST,
+    "past_title": TEXT_LIST,
+    "current_description": TEXT,
+    "current_comp_year": INT,
+    "current_comp_month": MONTH,
+    "start_year": INT_LIST,
+    "start_month": MONTH_LIST,
+    "end_year": INT_LIST,
+    "end_month": MONTH_LIST,
+    "employment_type": TEXT,
+    "location": TEXT,
+    "phone_number": TEXT,
+    "skill": TEXT_LIST,
+    "proficiency": TEXT_LIST,
+    # stored as text, the model answers "3", 3 or "3 years" alike
+    "years_experience": VALUE_LIST,
+    "last_used_year": VALUE_LIST,
+    "percentage_match": INT,
+    "short_description": TEXT,
+}
+
+# lists that describe the same entries index by index, keyed by the list that defines the entries
+PARALLEL_LISTS = {
+    "past_company": ("past_title", "description", "start_year", "start_month", "end_year", "end_month"),
+    "skill": ("proficiency", "years_experience", "last_used_year"),
+}
+
+# without these the evaluation is not worth storing, they are asked for again when absent
+REQUIRED_FIELDS = ("name", "percentage_match", "short_description")
+REQUIRED_FIELDS_NO_DESCRIPTION = ("name",)
+
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+# how many trailing entries may be dropped from a truncated response before giving up
+MAX_TRUNCATED_ENTRIES = 50
+
+
+def _strip(text):
+    text = _FENCE.sub("", text.strip())
+    start = text.find("{")
+    return text[start:] if start >= 0 else text
+
+
+def _scan(text):
+    # positions of the commas outside strings, where a truncated response can be cut,
+    # and of the brace closing the top level object (-1 when it never closes)
+    commas = []
+    depth = 0
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            commas.append(i)
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0 and ch == "}":
+                return commas, i
+    return commas, -1
+
+
+def _drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _balance(text):
+    # drop trailing commas, close an open string and every open array and object
+    out = []
+    stack = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+        out.append(ch)
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    if out and out[-1] == ":":
+        out.append("null")
+    return "".join(out) + "".join(reversed(stack))
+
+
+def repair(text):
+    # returns (data, repaired); raises ValueError when the text cannot be made into an object
+    if not text:
+        raise ValueError("Empty response")
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data, False
+    except ValueError:
+        pass
+
+    candidate = _strip(text)
+    commas, end = _scan(candidate)
+    if end >= 0:
+        # prose after a complete object
+        try:
+            data = json.loads(_balance(candidate[:end + 1]))
+            if isinstance(data, dict):
+                return data, True
+        except ValueError:
+            pass
+        candidate = candidate[:end + 1]
+    for _ in range(MAX_TRUNCATED_ENTRIES):
+        try:
+            data = json.loads(_balance(candidate))
+            if isinstance(data, dict):
+                return data, True
+        except ValueError:
+            pass
+        # cut the last, incomplete entry and try again
+        if not commas:
+            break
+        candidate = candidate[:commas.pop()]
+
+    raise ValueError("Response is not a repairable JSON object")
+
+
+def missing_fields(data, no_description=False):
+    required = REQUIRED_FIELDS_NO_DESCRIPTION if no_description else REQUIRED_FIELDS
+    # a null is the model's answer, an absent key means the response was cut off
+    return [field for field in required if field not in data]
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(round(value))
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return int(round(float(match.group())))
+    return None
+
+
+def _to_month(value):
+    month = _to_int(value)
+    # 0 is the prompt's "unknown", anything else is clamped into the calendar
+    if month is None or month == 0:
+        return month
+    return min(12, max(1, month))
+
+
+def _to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value if v is not None)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value).strip()
+
+
+def _to_value(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return _to_text(value)
+
+
+def _to_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        # the model sometimes returns {"0": ..., "1": ...} despite the prompt
+        return list(value.values())
+    return [value]
+
+
+ITEM_COERCE = {
+    TEXT_LIST: _to_text,
+    INT_LIST: _to_int,
+    MONTH_LIST: _to_month,
+    VALUE_LIST: _to_value,
+}
+SCALAR_COERCE = {
+    TEXT: _to_text,
+    INT: _to_int,
+    MONTH: _to_month,
+}
+
+
+def normalize(data):
+    # returns a new dict with every schema field present and typed; unknown keys are kept
+    out = dict(data)
+    for field, kind in FIELDS.items():
+        value = data.get(field)
+        if kind in ITEM_COERCE:
+            out[field] = [ITEM_COERCE[kind](v) for v in _to_list(value)]
+        else:
+            out[field] = SCALAR_COERCE[kind](value)
+
+    for field in ("current_comp_year", "current_comp_month"):
+        if out[field] is None:
+            out[field] = 0
+
+    if out["percentage_match"] is None:
+        out["percentage_match"] = 0
+    out["percentage_match"] = min(100, max(0, out["percentage_match"]))
+
+    for key, dependents in PARALLEL_LISTS.items():
+        size = len(out[key])
+        for field in dependents:
+            values = out[field][:size]
+            out[field] = values + [None] * (size - len(values))
+
+    return out
@@ -0,0 +1,132 @@
+import os
+from io import BytesIO
+
+import metrics
+import ocr
+
+# Per page hybrid extraction.
+# Every page goes through the native text engine first; only pages that come back
+# (nearly) empty but carry images are sent to Gemini OCR, so OCR cost follows the
+# number of scanned pages instead of the whole document.
+
+EXTRACTION_ENGINE = os.getenv("EXTRACTION_ENGINE", "pymupdf")
+# a page with fewer characters than this is treated as scanned
+EXTRACTION_MIN_CHARS = int(os.getenv("EXTRACTION_MIN_CHARS", "20"))
+# pages are joined with a form feed so prompts.normalize_text can tell where they end
+PAGE_BREAK = "\f"
+
+
+def _open(source):
+    # PyMuPDF and pypdf load on first use, see flask1.warm_up for preloading
+    import fitz
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def pymupdf_pages(source):
+    doc = _open(source)
+    try:
+        return [page.get_text() for page in doc]
+    finally:
+        doc.close()
+
+
+def pypdf_pages(source):
+    from pypdf import PdfReader
+    reader = PdfReader(source if isinstance(source, str) else BytesIO(source))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+# name -> function(source) returning the text of every page, in order
+ENGINES = {
+    "pymupdf": pymupdf_pages,
+    "pypdf": pypdf_pages,
+}
+
+
+def register_engine(name, fn):
+    ENGINES[name] = fn
+
+
+def native_extraction(source, engine=None):
+    # text layer only, never OCR; used where speed matters more than scanned pages.
+    # Returns (extraction, complete): complete when no page would go to OCR, so the
+    # result is exactly what extract_text returns for the document
+    engine = engine or EXTRACTION_ENGINE
+    pages = ENGINES[engine](source)
+    complete = bool(pages) and all(len(text.strip()) >= EXTRACTION_MIN_CHARS for text in pages)
+    extraction = {
+        "text": PAGE_BREAK.join(pages),
+        "engine": engine,
+        "gemini_tokens": 0,
+        "page_count": len(pages),
+        "ocr_pages": [],
+    }
+    return extraction, complete
+
+
+def _page_runs(indexes):
+    # [0, 1, 4] -> [[0, 1], [4]], consecutive scanned pages share one Gemini call
+    runs = []
+    for i in indexes:
+        if runs and runs[-1][-1] == i - 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+    return runs
+
+
+def extract_text(source, engine=None):
+    engine = engine or EXTRACTION_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine}")
+
+    pages = ENGINES[engine](source)
+
+    empty_pages = [i for i, text in enumerate(pages) if len(text.strip()) < EXTRACTION_MIN_CHARS]
+
+    if len(empty_pages) == len(pages):
+        # nothing native at all, OCR everything like before (text drawn as vectors has no images)
+        ocr_pages = empty_pages
+    else:
+        doc = _open(source)
+        try:
+            ocr_pages = [i for i in empty_pages if doc[i].get_images(full=False)]
+        finally:
+            doc.close()
+
+    if ocr_pages:
+        metrics.OCR_FALLBACKS.inc()
+        metrics.OCR_PAGES.inc(len(ocr_pages))
+
+    gemini_token = 0
+    ocr_text = {}
+    for run in _page_runs(ocr_pages):
+        text, tokens = ocr.ocr_document(source, page_numbers=run)
+        ocr_text[run[0]] = text
+        gemini_token += tokens
+
+    # pages are joined once at the end instead of growing a string page by page
+    parts = []
+    ocr_set = set(ocr_pages)
+    for i, text in enumerate(pages):
+        if i in ocr_text:
+            parts.append(ocr_text[i])
+        elif i not in ocr_set and text.strip():
+            parts.append(text)
+
+    if not ocr_pages:
+        engine_used = engine
+    elif len(ocr_pages) == len(pages):
+        engine_used = "gemini-ocr"
+    else:
+        engine_used = f"{engine}+gemini-ocr"
+
+    return {
+        "text": PAGE_BREAK.join(parts),
+        "engine": engine_used,
+        "gemini_tokens": gemini_token,
+        "page_count": len(pages),
+        "ocr_pages": [i + 1 for i in ocr_pages],
+    }
@@ -1,78 +1,102 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS  
-import fitz
-from PIL import Image
 import traceback
-import base64
-import io
-import json
+import importlib
 import os
-import openai
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import tempfile
-import google.generativeai as genai
-from io import BytesIO
-from pypdf import PdfReader
 import uuid
+import time
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import requests
-from io import BytesIO
 from zoneinfo import ZoneInfo
 import random
-from faker import Faker
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import db
+from db import get_connection
+import eval_cache
+import text_store
+import persistence
+import jobs
+import ocr
+import extraction
+import metrics
+import uploader
+import prompts
+import job_profile
+import prescreen
+import search
+import ratelimit
+import evaluation_schema
+import admission
+import bulk
 
-fake = Faker()
 app = Flask(__name__)
 CORS(app)
 load_dotenv()
 
-# PostgreSQL Connection String
-pg_connection_string = f"""
-    host={os.getenv("PG_HOST")}
-    port={os.getenv("PG_PORT")}
-    dbname={os.getenv("PG_NAME")}
-    user={os.getenv("PG_USER")}
-    password={os.getenv("PG_PASSWORD")}
-"""
-
 # OpenAI & Gemini Setup
-openai.api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# PostgreSQL Connection
-# conn = psycopg2.connect(pg_connection_string)
-# cursor = conn.cursor(cursor_factory=RealDictCursor)
+# Both SDKs are slow to import, the OpenAI client is built on first use and Gemini
+# is configured by ocr.gemini_model the first time a page needs OCR
+client = None
+_client_lock = threading.Lock()
+_fake = None
+
+# Imported by warm_up so a preloading gunicorn master pays for them once
+# and every forked worker starts with them already loaded
+PRELOAD_MODULES = ("openai", "google.generativeai", "fitz", "pypdf", "numpy")
+
+# Upload size limits, MAX_REQUEST_MB also bounds a whole batch request
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "20"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+MAX_REQUEST_MB = int(os.getenv("MAX_REQUEST_MB", "200"))
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_MB * 1024 * 1024
+
+# Batch evaluation limits
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "8"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+# Job workers started inside each web worker, so the container alone drains the queue;
+# set 0 when worker.py runs as its own process
+JOB_INPROCESS_WORKERS = int(os.getenv("JOB_INPROCESS_WORKERS", "2"))
+# Queue priority of batch resumes deferred by the pre-screen, normal jobs are 0
+PRESCREEN_DEFER_PRIORITY = int(os.getenv("PRESCREEN_DEFER_PRIORITY", "-10"))
+# Bulk runner thread inside each web worker, picks up runs created through POST /bulk-runs;
+# set false when bulk_screen.py --watch runs as its own process
+BULK_INPROCESS_RUNNER = os.getenv("BULK_INPROCESS_RUNNER", "true").lower() == "true"
+
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                # no SDK retries, ratelimit.call owns every retry so they go through the shared buckets
+                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return client
+
+def get_fake():
+    # faker is only used by the is_dummy path
+    global _fake
+    if _fake is None:
+        from faker import Faker
+        _fake = Faker()
+    return _fake
+
+def warm_up():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"⚠️ Could not preload {name}: {e}")
 
 # Gemini OCR
 def process_pdf_with_gemini_ocr(pdf_path, dpi=500):
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    doc = fitz.open(pdf_path)
-    images = []
-
-    for page in doc:
-        zoom = dpi / 72
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
-        
-        img_bytes = BytesIO(pix.tobytes("png"))
-        img = Image.open(img_bytes)
-        images.append(img)
-
-    doc.close()
-
-    prompt = f"""
-    you are an ocr tools that extract resume. dont add anything and only return the resume   
-    """
-
-    response = model.generate_content([prompt, *images])
-    return response.text, response.usage_metadata.total_token_count
+    # dpi is the ceiling, the engine picks the actual DPI per page from its size
+    return ocr.ocr_document(pdf_path, max_dpi=dpi)
 
 def dummy_data():
+    fake = get_fake()
     data = {
         "LOG_HISTORY_ID": str(uuid.uuid4()),
         "name": fake.name(),
@@ -104,128 +128,162 @@ def dummy_data():
     return jsonify(data)
 
 
-# Evaluation
-def evaluate_resume(pdf_path, original_filename, job_desc, user_id, url, job_name, id_MM_user, batch_id, acceptance = 70, is_dummy = False):
-
-    if is_dummy:
-        return dummy_data()
-    
-    current_uuid = str(uuid.uuid4())
-    # Open the PDF
-    reader = PdfReader(pdf_path)
-    
-    accpetanceVal = acceptance
-
-    gemini_token = 0
+# Text extraction, returns the resume text plus the Gemini tokens spent on it
+def extract_resume_text(pdf_path, file_hash):
+    # Extraction does not depend on the job, reuse the text from any earlier screening
+    stored = text_store.get(file_hash)
+    metrics.cache_event("text_store", stored is not None)
+    if stored is not None:
+        return stored["text"], 0
+
+    # Native text per page, Gemini OCR only for the scanned pages
+    with metrics.stage("extraction"):
+        extracted = extraction.extract_text(pdf_path)
+
+    text_store.put(
+        file_hash,
+        extracted["text"],
+        extracted["engine"],
+        extracted["gemini_tokens"],
+        extracted["page_count"]
+    )
 
-    # Collect text from all pages
-    has_text = False
-    all_text = ''
+    return extracted["text"], extracted["gemini_tokens"]
+
+# Local lexical score, None when the pre-screen is off or there is no job to match
+def prescreen_resume(resume, job_desc):
+    if not prescreen.PRESCREEN_ENABLED or job_desc == prompts.NO_DESCRIPTION:
+        return None
+    profile = job_profile.get_profile(get_client(), job_desc)
+    with metrics.stage("prescreen"):
+        return prescreen.score(prescreen.query_text(job_desc, profile), resume)
+
+def prescreen_batch(uploads, job_desc, profile):
+    # one vectorized scoring pass, so term weights come from the batch itself;
+    # files without a text layer get None and are scored after OCR
+    scores = [None] * len(uploads)
+    if not prescreen.PRESCREEN_ENABLED or job_desc == prompts.NO_DESCRIPTION:
+        return scores
+
+    with metrics.stage("prescreen"):
+        texts = {}
+        for i, (_, file_bytes) in enumerate(uploads):
+            if file_bytes is None:
+                continue
+            file_hash = eval_cache.hash_bytes(file_bytes)
+            stored = text_store.get(file_hash)
+            if stored is not None:
+                text = stored["text"]
+            else:
+                try:
+                    extracted, complete = extraction.native_extraction(file_bytes)
+                except Exception:
+                    continue
+                text = extracted["text"]
+                # nothing left for OCR, store it so evaluate_resume does not parse the file again
+                if complete:
+                    text_store.put(file_hash, text, extracted["engine"], 0, extracted["page_count"])
+            if len(text.strip()) >= extraction.EXTRACTION_MIN_CHARS:
+                texts[i] = text
+
+        if texts:
+            indexes = list(texts)
+            values = prescreen.scores(prescreen.query_text(job_desc, profile), [texts[i] for i in indexes])
+            for i, value in zip(indexes, values):
+                scores[i] = float(value)
+    return scores
+
+def openai_complete(prompt, prompt_tokens):
+    with metrics.stage("openai"):
+        response = ratelimit.call(
+            "openai",
+            lambda: get_client().responses.create(
+                model="gpt-5-nano",
+                input=prompt
+            ),
+            prompt_tokens + ratelimit.OPENAI_OUTPUT_TOKENS,
+            usage=lambda r: r.usage.total_tokens
+        )
 
-    for page in reader.pages:
-        text = page.extract_text()
-        if text and text.strip():  # Check if text exists and is non-empty
-            has_text = True
-            all_text += text
+    metrics.add_tokens("openai", response.usage.total_tokens)
+    return response.output_text, response.usage.total_tokens
 
-    if not has_text:
-        all_text, gemini_token = process_pdf_with_gemini_ocr(pdf_path)
+# Evaluation prompt, returns the prompt, its token estimate and the job profile it used
+def build_prompt(resume, job_desc, accpetanceVal):
+    no_description = job_desc == prompts.NO_DESCRIPTION
 
-    resume = all_text
+    # the job is read once per distinct description, every resume gets the compact profile
+    profile = None if no_description else job_profile.get_profile(get_client(), job_desc)
 
-    no_description = job_desc == "!##NO DESCRIPTION##!"
+    # static instructions first so the provider can reuse the cached prefix, resume last
+    prompt, prompt_stats = prompts.build_evaluation_prompt(
+        job_desc,
+        resume,
+        accpetanceVal,
+        job_profile_text=job_profile.render_profile(profile) if profile else None
+    )
+    metrics.PROMPT_TOKENS.inc(prompt_stats["prompt_tokens"])
+    metrics.PROMPT_TOKENS_SAVED.inc(prompt_stats["saved_tokens"])
+    return prompt, prompt_stats, profile
 
-    if no_description:
-        prompt = f"""
-    You are a resume evaluator. You are given the following inputs:
-    Job Description: {job_desc}
-    Resume: {resume}
-    Analyze the resume and return in raw JSON format only (without any markdown formatting or labels).
-    if they dont put any year or month just assume they dont have a current company and put all in past company and title
-    Return the following fields in the JSON:
-    name: Full name of the candidate
-    title: current job title
-    job_desription: the job description
-    email: Email address
-    company: current company
-    past_company: list of all past companies as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)  
-    description: list of all past description of the candidate work as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)  
-    past_title: job title held before as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)  
-    current_description: current company description
-    current_comp_year: current company start year must be in integer if null must return 0 and dont make up any answer must be based on resume
-    current_comp_month: current company start month must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
-    start_year: list of all start year of all past company and title and dont make up any answer must be based on resume if null must return 0
-    start_month: list of all start month of all past company and title must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
-    end_year: list of all end year of all past company and title and dont make up any answer must be based on resume if null must return 0
-    end_month: list of all end year of all past company and title must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
-    employment_type: permanent or contract
-    location: current company location
-    phone_number: Phone number
-    skill: list down 5 skill that the candidate have
-    proficiency: proficiency of the 5 skill you listed
-    years_experience: years experience for the 5 skill you listed must return in list for each skill or return null if you dont know
-    last_used_year: last used year for 5 skill u listed or return null if you dont know
-    percentage_match: put 0 only
-    short_description: A 1–2 sentence summary of the about candidate
-    """
-    else:
-        prompt = f"""
-    You are a resume evaluator. You are given the following inputs:
-    Job Description: {job_desc}
-    Resume: {resume}
-    Analyze the resume against the job description and return your evaluation in raw JSON format only (without any markdown formatting or labels).
-    Return the following fields in the JSON:
-    name: Full name of the candidate
-    title: current job title
-    job_desription: the job description
-    email: Email address
-    company: current company
-    past_company: list of all past companies as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
-    description: list of all past description of the candidate work as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
-    past_title: job title held before as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
-    current_description: current company description
-    current_comp_year: current company start year must be in integer
-    current_comp_month: current company start month must be in integer in range of 1 to 12
-    start_year: list of all start year of all past company and title
-    start_month: list of all start month of all past company and title must be in integer in range of 1 to 12
-    end_year: list of all end year of all past company and title must be null if for current company
-    end_month: list of all end year of all past company and title must be in integer in range of 1 to 12 must be null if for current company
-    employment_type: permanent or contract
-    location: current company location
-    phone_number: Phone number
-    skill: list down 5 skill that the candidate have
-    proficiency: proficiency of the 5 skill you listed
-    years_experience: years experience for the 5 skill you listed must return in list for each skill
-    last_used_year: last used year for 5 skill u listed
-    percentage_match: An integer percentage (0–100) representing how well the resume matches the job description
-    short_description: A 1–2 sentence summary of the candidate relevant to the job and you must include whether
-    <b>Ai Suggestion : <span class='text-success'>Can be hired </span> </b> if percentage_match above {accpetanceVal} or
-    <b>Ai Suggestion : <span class='text-danger'>Not recommended to be hired</span></b> below
-    do <br> before the ai suggestion html script
-    """
+# LLM evaluation, returns the raw model fields plus the tokens spent on them
+def llm_evaluate(resume, job_desc, accpetanceVal):
+    no_description = job_desc == prompts.NO_DESCRIPTION
+    prompt, prompt_stats, profile = build_prompt(resume, job_desc, accpetanceVal)
 
     # Second response: Evaluation
-    response2 = client.responses.create(
-        model="gpt-5-nano",
-        input=prompt
-    )
+    output, total_tokens = openai_complete(prompt, prompt_stats["prompt_tokens"])
 
-    if not response2.output_text:
+    if not output:
         raise ValueError("Evaluation response is empty or invalid.")
 
+    # repair locally first, ask the model again only when the output is beyond repair
     try:
-        data = json.loads(response2.output_text)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON response: {response2.output_text}") from e
-
+        data, repaired = evaluation_schema.repair(output)
+        metrics.JSON_REPAIRS.labels(result="repaired" if repaired else "valid").inc()
+    except ValueError:
+        reformat = prompts.build_reformat_prompt(output, list(evaluation_schema.FIELDS))
+        retry_output, tokens = openai_complete(reformat, prompts.estimate_tokens(reformat))
+        total_tokens += tokens
+        try:
+            data, _ = evaluation_schema.repair(retry_output)
+        except ValueError as e:
+            metrics.JSON_REPAIRS.labels(result="failed").inc()
+            raise ValueError(f"Invalid JSON response: {output}") from e
+        metrics.JSON_REPAIRS.labels(result="reformatted").inc()
+
+    # a truncated answer loses its last fields, generate only those again
+    missing = evaluation_schema.missing_fields(data, no_description)
+    if missing:
+        followup = prompts.build_missing_fields_prompt(prompt, missing)
+        followup_output, tokens = openai_complete(followup, prompts.estimate_tokens(followup))
+        total_tokens += tokens
+        try:
+            extra, _ = evaluation_schema.repair(followup_output)
+            data.update({field: extra[field] for field in missing if field in extra})
+            metrics.JSON_REPAIRS.labels(result="fields_reasked").inc()
+        except ValueError:
+            print(f"⚠️ Could not recover missing fields {missing}")
+
+    data = evaluation_schema.normalize(data)
+
+    # the model only saw the profile, keep the stored job description verbatim
+    if profile:
+        data["job_desription"] = job_desc
+
+    return data, total_tokens
+
+# Request fields stored alongside the model answer
+def stamp_evaluation(data, user_id, url, gemini_token, openai_token, cache_hit, original_filename, accpetanceVal, job_name, no_description):
     data["user_id"] = user_id
     data["file_url"] = url
     data["date"] = datetime.now(ZoneInfo("Asia/Kuala_Lumpur"))
     data["total_token_gemini"] = gemini_token
-    data["total_token_openai"] = response2.usage.total_tokens
+    data["total_token_openai"] = openai_token
+    data["cache_hit"] = cache_hit
     data["pdf_name"] = original_filename
     data["match_acceptence" ] = accpetanceVal
-    data["LOG_HISTORY_ID"] = current_uuid
+    data["LOG_HISTORY_ID"] = str(uuid.uuid4())
     
     if job_name != "!##NOJOBNAME##!": 
      data["title"] = job_name
@@ -233,266 +291,170 @@ def evaluate_resume(pdf_path, original_filename, job_desc, user_id, url, job_nam
     if no_description:
         data["percentage_match"] = 0
 
-    with psycopg2.connect(pg_connection_string) as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cand_id = str(uuid.uuid4())
-
-            # --- Insert into log_history_batch first
-            cursor.execute("""
-                INSERT INTO log_history_batch (batch_id, created_by)
-                VALUES (%s, %s)
-                ON CONFLICT (batch_id) DO NOTHING;
-            """, (batch_id, user_id))
-
-
-            # --- LOG_HISTORY insert (unchanged) ---
-            if not no_description:
-                values = (
-                    data["LOG_HISTORY_ID"],
-                    data["user_id"],
-                    data["date"],
-                    data["title"],
-                    data["job_desription"],
-                    data["file_url"],
-                    data["name"],
-                    data["email"],
-                    data["phone_number"],
-                    data["percentage_match"],
-                    data["short_description"],
-                    0,
-                    data["total_token_openai"],
-                    data["total_token_gemini"],
-                    data["match_acceptence"],
-                    batch_id
-                )
-                insert_query = """
-                INSERT INTO LOG_HISTORY (
-                    "LOG_HISTORY_ID", user_id, date_run, title, job_description,
-                    file_url, name, email, phone_no, match_percentage,
-                    short_desc, is_shortlisted, gpt_token, gemini_token, match_acceptance, batch_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(insert_query, values)
-
-            # --- find existing candidate ---
-            cursor.execute(
-                "SELECT candidate_id FROM candidates WHERE owner_email = %s AND candidate_email = %s",
-                (user_id, data.get("email"))
-            )
-            existing = cursor.fetchone()
-
-            # unify candidate_id variable so later code can always use it
-            if existing:
-                candidate_id = existing["candidate_id"]
-
-                # update candidate top-level fields
-                cursor.execute("""
-                    UPDATE candidates
-                    SET current_company = %s,
-                        current_title = %s,
-                        updated_at = now()
-                    WHERE candidate_id = %s
-                """, (
-                    data.get("company"),
-                    data.get("title"),
-                    candidate_id
-                ))
-
-                # Handle current company experience: update if exists, else insert
-                current_year = data.get("current_comp_year")
-                current_month = data.get("current_comp_month")
-
-                # Only consider a "current job" entry when we have both start year & month (and valid > 0)
-                if (current_year is not None and current_month is not None
-                        and isinstance(current_year, int) and isinstance(current_month, int)
-                        and current_year > 0 and current_month > 0):
-
-                    # Try updating an existing candidate_experience row for this company
-                    cursor.execute("""
-                        UPDATE candidate_experience
-                        SET company = %s,
-                            description = %s,
-                            title = %s,
-                            start_year = %s,
-                            start_month = %s,
-                            employment_type = %s,
-                            end_year = NULL,
-                            end_month = NULL,
-                            is_current = TRUE,
-                            updated_at = now()
-                        WHERE candidate_id = %s AND company = %s
-                    """, (
-                        data.get("company"),
-                        data.get("current_description"),
-                        data.get("title"),
-                        current_year,
-                        current_month,
-                        data.get("employment_type"),
-                        candidate_id,
-                        data.get("company")
-                    ))
-
-                    # If no row was updated, insert it (explicit end_year/end_month NULL, is_current TRUE)
-                    if cursor.rowcount == 0:
-                        cursor.execute("""
-                            INSERT INTO candidate_experience (
-                                candidate_id, company, title, description,
-                                start_year, start_month, end_year, end_month, employment_type, is_current, created_at
-                            ) VALUES (%s, %s, %s, %s, %s, %s, NULL, NULL, %s, TRUE, now())
-                        """, (
-                            candidate_id,
-                            data.get("company"),
-                            data.get("title"),
-                            data.get("current_description"),
-                            current_year,
-                            current_month,
-                            data.get("employment_type")
-                        ))
+    return data
 
-            else:
-                # New candidate path
-                candidate_id = cand_id
-
-                # insert skills
-                skills = data.get("skill", [])
-                proficiency = data.get("proficiency", [])
-                years_exp = data.get("years_experience", [])
-                last_used = data.get("last_used_year", [])
-
-                insert_skill_q = """
-                    INSERT INTO candidate_skills (
-                        candidate_id, skill_name, proficiency, years_experience, last_used_year, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, now())
-                """
-                for i in range(len(skills)):
-                    cursor.execute(insert_skill_q, (
-                        candidate_id,
-                        skills[i],
-                        proficiency[i] if i < len(proficiency) else None,
-                        years_exp[i] if i < len(years_exp) else None,
-                        last_used[i] if i < len(last_used) else None
-                    ))
-
-                # insert candidate master row
-                insert_candidate_q = """
-                    INSERT INTO candidates (
-                        candidate_id, owner_email, full_name, current_company, notes, current_title,
-                        location, candidate_email, phone, resume_url,user_id, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now())
-                """
-                cursor.execute(insert_candidate_q, (
-                    candidate_id,
-                    user_id,
-                    data.get("name"),
-                    data.get("company"),
-                    data.get("current_description"),
-                    data.get("title"),
-                    data.get("location"),
-                    data.get("email"),
-                    data.get("phone_number"),
-                    url,
-                    user_id
-                ))
-
-                # Insert current experience row if start date available
-                current_year = data.get("current_comp_year")
-                current_month = data.get("current_comp_month")
-                if (current_year is not None and current_month is not None
-                        and isinstance(current_year, int) and isinstance(current_month, int)
-                        and current_year > 0 and current_month > 0):
-                    cursor.execute("""
-                        INSERT INTO candidate_experience (
-                            candidate_id, company, title, description,
-                            start_year, start_month, end_year, end_month, employment_type, is_current, created_at
-                        ) VALUES (%s, %s, %s, %s, %s, %s, NULL, NULL, %s, TRUE, now())
-                    """, (
-                        candidate_id,
-                        data.get("company"),
-                        data.get("title"),
-                        data.get("current_description"),
-                        current_year,
-                        current_month,
-                        data.get("employment_type")
-                    ))
-
-            # --- Insert past experiences ---
-            past_companies = data.get("past_company", [])
-            past_titles = data.get("past_title", [])
-            past_descriptions = data.get("description", [])
-            start_years = data.get("start_year", [])
-            start_months = data.get("start_month", [])
-            end_years = data.get("end_year", [])
-            end_months = data.get("end_month", [])
-
-            for i, company in enumerate(past_companies):
-                # skip duplicate past company rows for this candidate where is_current = false
-                cursor.execute("""
-                    SELECT 1 FROM candidate_experience
-                    WHERE candidate_id = %s AND company = %s AND is_current = FALSE
-                """, (candidate_id, company))
-                if cursor.fetchone():
-                    continue
+# Evaluation
+def evaluate_resume(pdf_path, original_filename, job_desc, user_id, url, job_name, id_MM_user, batch_id, acceptance = 70, is_dummy = False, file_hash = None, persist = True, prescreen_score = None):
 
-                # extract safely
-                start_year = start_years[i] if i < len(start_years) else None
-                start_month = start_months[i] if i < len(start_months) else None
-                end_year = end_years[i] if i < len(end_years) else None
-                end_month = end_months[i] if i < len(end_months) else None
-
-                # normalize inconsistent data:
-                # if end_year is None, force end_month to None as well (month without year is meaningless)
-                if end_year is None:
-                    end_month = None
-
-                # determine is_current: only True when both end_year and end_month are None
-                is_current = (end_year is None and end_month is None)
-
-                # If end_year exists then it's a past job -> is_current False
-                if end_year is not None:
-                    is_current = False
-
-                cursor.execute("""
-                    INSERT INTO candidate_experience (
-                        candidate_id, company, title, description,
-                        start_year, start_month, end_year, end_month, is_current, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, now())
-                """, (
-                    candidate_id,
-                    company,
-                    past_titles[i] if i < len(past_titles) else None,
-                    past_descriptions[i] if i < len(past_descriptions) else None,
-                    start_year,
-                    start_month,
-                    end_year,
-                    end_month,
-                    is_current
-                ))
-
-            # Track the candidate_track, user_id, and resume_id is exsit or not
-            cursor.execute("""
-                SELECT 1 FROM candidate_track
-                WHERE user_id = %s AND resume_id = %s
-                LIMIT 1
-            """, (id_MM_user, candidate_id))
-
-            track_exists = cursor.fetchone()
-
-            print(id_MM_user)
-
-            if not track_exists:
-                cursor.execute("""
-                    INSERT INTO candidate_track (user_id, resume_id)
-                    VALUES (%s, %s)
-                """,(
-                    id_MM_user,
-                    candidate_id
-                ))
-
-            conn.commit()
+    if is_dummy:
+        return dummy_data()
+    
+    accpetanceVal = acceptance
+
+    no_description = job_desc == "!##NO DESCRIPTION##!"
 
+    # Same PDF against the same job gives the same answer, skip extraction and the LLM
+    # (pdf_path may also be the PDF bytes)
+    if file_hash is None:
+        file_hash = eval_cache.hash_bytes(pdf_path) if isinstance(pdf_path, bytes) else eval_cache.hash_file(pdf_path)
+    cache_key = eval_cache.make_key(file_hash, job_desc, job_name, accpetanceVal)
+
+    with metrics.stage("cache_lookup"):
+        data = eval_cache.get(cache_key)
+    cache_hit = data is not None
+    metrics.cache_event("evaluation", cache_hit)
+
+    if cache_hit:
+        gemini_token, openai_token = 0, 0
+    else:
+        resume, gemini_token = extract_resume_text(pdf_path, file_hash)
+
+        # batches score on native text, scanned resumes are scored here after OCR
+        if prescreen_score is None:
+            prescreen_score = prescreen_resume(resume, job_desc)
+
+        if prescreen.PRESCREEN_MODE == "skip" and prescreen.below_floor(prescreen_score):
+            metrics.PRESCREEN_SKIPS.inc()
+            data, openai_token = prescreen.skipped_evaluation(prescreen_score), 0
+            data["job_desription"] = job_desc
+        else:
+            data, openai_token = llm_evaluate(resume, job_desc, accpetanceVal)
+            eval_cache.put(cache_key, data)
+
+        if prescreen_score is not None:
+            data["prescreen_score"] = round(prescreen_score, 1)
+
+    # the upload has been running since the request came in, wait for it only now
+    if isinstance(url, Future):
+        with metrics.stage("upload_wait"):
+            try:
+                url = url.result()
+            except Exception as e:
+                # the evaluation is already paid for, it is stored without a url and
+                # the caller retries the upload in the background
+                print(f"⚠️ Upload failed for {original_filename}, storing without a url: {e}")
+                url = None
+
+    stamp_evaluation(data, user_id, url, gemini_token, openai_token, cache_hit, original_filename, accpetanceVal, job_name, no_description)
+
+    if persist:
+        with metrics.stage("db"):
+            with get_connection() as conn:
+                persistence.save_evaluation(conn, data, batch_id, id_MM_user, no_description)
 
     return data
 
+def process_job(job):
+    from pypdf.errors import PdfReadError
+    params = job["params"]
+    try:
+        return process_resume_file(
+            job["file_bytes"],
+            job["filename"],
+            params["job_desc"],
+            params["user_id"],
+            params["job_name"],
+            params["id_MM_user"],
+            params["batch_id"]
+        )
+    except PdfReadError as e:
+        # a corrupt PDF will not get better on retry
+        raise jobs.PermanentJobError(f"Unreadable PDF: {e}") from e
+
+def start_job_workers():
+    if JOB_INPROCESS_WORKERS > 0:
+        jobs.start_workers(process_job, JOB_INPROCESS_WORKERS)
+
+def start_bulk_runner():
+    # runs are claimed with a lock, so one runner per web worker never doubles up
+    if BULK_INPROCESS_RUNNER:
+        threading.Thread(target=bulk.watch, name="bulk-runner", daemon=True).start()
+
+class UploadTooLarge(ValueError):
+    pass
+
+def read_upload(file):
+    # one bounded read into a single buffer that the hash, the uploader, pypdf and
+    # PyMuPDF all share; werkzeug closes its spooled temp file when the request ends
+    file_bytes = file.stream.read(MAX_UPLOAD_BYTES + 1)
+    if len(file_bytes) > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"{file.filename} is larger than {MAX_UPLOAD_MB} MB")
+    return file_bytes
+
+def upload_resume_file(file_bytes, filename):
+    # 🟢 Upload to remote API
+    return uploader.upload(file_bytes, filename)
+
+def store_file_url(data, url):
+    # background uploads finish after the evaluation was saved, patch the url in
+    with get_connection() as conn:
+        persistence.set_file_url(conn, data["LOG_HISTORY_ID"], data["user_id"], data.get("email"), url)
+
+def upload_in_background(data, file_bytes, filename):
+    uploader.submit_background(
+        upload_resume_file,
+        file_bytes,
+        filename,
+        lambda url: store_file_url(data, url)
+    )
+
+def process_resume_file(file_bytes, filename, job_desc, user_id, job_name, id_MM_user, batch_id, persist=True, include_timings=False, prescreen_score=None):
+    started = time.perf_counter()
+    background_upload = uploader.UPLOAD_MODE == "background"
+    with metrics.collect_timings() as timings:
+        # 🟢 Upload runs alongside extraction and the LLM, evaluate_resume joins it before the DB write
+        url = None if background_upload else uploader.submit(upload_resume_file, file_bytes, filename)
+
+        # 🟢 No temp file, pypdf and PyMuPDF read the same in-memory buffer
+        original_filename = secure_filename(filename)
+        result = evaluate_resume(
+            file_bytes,
+            original_filename,
+            job_desc,
+            user_id,
+            url,
+            job_name,
+            id_MM_user,
+            batch_id,
+            acceptance = 70,
+            is_dummy=False,
+            file_hash=eval_cache.hash_bytes(file_bytes),
+            persist=persist,
+            prescreen_score=prescreen_score
+        )
+
+    # batch callers persist later and schedule the upload themselves; a failed inline
+    # upload is retried the same way
+    if persist and (background_upload or result.get("file_url") is None):
+        upload_in_background(result, file_bytes, filename)
+
+    if include_timings:
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["timings"] = timings
+
+    return result
+
+# 🚦 Admission control, weighted by how much work the PDF will cause
+def process_admitted_file(file_bytes, filename, job_desc, user_id, *args, **kwargs):
+    with admission.controller.admit(user_id, admission.estimate_cost(file_bytes)):
+        return process_resume_file(file_bytes, filename, job_desc, user_id, *args, **kwargs)
+
+def busy_response(e):
+    metrics.REQUEST_ERRORS.labels(endpoint="admission").inc()
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
 @app.route('/evaluate-resume', methods=['POST'])
 def upload_resume():
     job_desc = request.form.get('job_desc')
@@ -502,6 +464,8 @@ def upload_resume():
     batch_id = request.form.get('batch_id') or request.form.get('batchId')
     acceptance = request.form.get('acceptance')
     is_dummy = request.form.get('is_dummy')
+    is_async = str(request.form.get('async', '')).lower() == "true"
+    include_timings = str(request.form.get('include_timings', '')).lower() == "true"
 
     if not job_desc:
         return jsonify({'error': 'No job description provided'}), 400
@@ -528,42 +492,347 @@ def upload_resume():
         return jsonify({'error': 'No selected file'}), 400
 
     try:
-        # ✅ Read file content into memory
-        file_bytes = file.read()
-
-        # 🟢 Upload to remote API
-        upload_response = requests.post(
-            "http://webapifileupload.aiscreenmax.my/api/ResumeUpload/UploadFile",
-            files={'file_url': (file.filename, BytesIO(file_bytes))},
-            data={"foldername": "dev"}
-        )
-
-        # Extract URL string
-        url = upload_response.text  # or upload_response.json().get("url")
-
-        # 🟢 Save file locally
-        original_filename = secure_filename(file.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(file_bytes)
-            result = evaluate_resume(
-                tmp.name,
-                original_filename,
-                job_desc,
-                user_id,
-                url,
-                job_name,
-                id_MM_user,
-                batch_id,
-                acceptance = 70,
-                is_dummy=False
+        # ✅ Read file content into memory, once
+        file_bytes = read_upload(file)
+
+        # 🟢 Async mode, store the file and let a job worker do the rest
+        if is_async:
+            job_id = jobs.enqueue(
+                {
+                    'job_desc': job_desc,
+                    'user_id': user_id,
+                    'job_name': job_name,
+                    'id_MM_user': id_MM_user,
+                    'batch_id': batch_id
+                },
+                file.filename,
+                file_bytes
             )
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f"/jobs/{job_id}"
+            }), 202
+
+        result = process_admitted_file(
+            file_bytes,
+            file.filename,
+            job_desc,
+            user_id,
+            job_name,
+            id_MM_user,
+            batch_id,
+            include_timings=include_timings
+        )
 
         return jsonify(result)
 
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+    except admission.Rejected as e:
+        return busy_response(e)
+
     except Exception as e:
         print(f"❌ Backend error: {e}")
         traceback.print_exc()
+        metrics.REQUEST_ERRORS.labels(endpoint="evaluate-resume").inc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/evaluate-resume/batch', methods=['POST'])
+def upload_resume_batch():
+    job_desc = request.form.get('job_desc')
+    user_id = request.form.get('user_id')
+    job_name = request.form.get('job_name')
+    id_MM_user = request.form.get('id_MM_user')
+    batch_id = request.form.get('batch_id') or request.form.get('batchId')
+    max_in_flight = request.form.get('max_in_flight', type=int) or BATCH_MAX_IN_FLIGHT
+    include_timings = str(request.form.get('include_timings', '')).lower() == "true"
+
+    if not job_desc:
+        return jsonify({'error': 'No job description provided'}), 400
+
+    files = request.files.getlist('files') or request.files.getlist('file')
+    files = [f for f in files if f.filename != '']
+    if not files:
+        return jsonify({'error': 'No file part'}), 400
+
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({'error': f'Too many files, maximum is {BATCH_MAX_FILES}'}), 400
+
+    # ✅ Read every file while the request is still open, workers only see bytes
+    uploads = []
+    results = []
+    for f in files:
+        try:
+            uploads.append((f.filename, read_upload(f)))
+            results.append(None)
+        except UploadTooLarge as e:
+            uploads.append((f.filename, None))
+            results.append({'filename': f.filename, 'status': 'error', 'error': str(e)})
+
+    # build the job profile once up front, every file of the batch reuses it
+    profile = None
+    if job_desc != prompts.NO_DESCRIPTION:
+        profile = job_profile.get_profile(get_client(), job_desc)
+
+    # ✅ Local pre-screen over the native text of the whole batch: best matches are
+    # evaluated first, and in defer mode the obvious mismatches go to the job queue
+    scores = prescreen_batch(uploads, job_desc, profile)
+    order = sorted(
+        (i for i, (_, file_bytes) in enumerate(uploads) if file_bytes is not None),
+        key=lambda i: -1 if scores[i] is None else -scores[i]
+    )
+
+    deferred_order = []
+    if prescreen.PRESCREEN_MODE == "defer":
+        deferred_order = [i for i in order if prescreen.below_floor(scores[i])]
+        order = [i for i in order if i not in deferred_order]
+
+    # never exceed the server-side ceiling, whatever the client asks for
+    max_in_flight = max(1, min(max_in_flight, BATCH_MAX_IN_FLIGHT, len(uploads)))
+
+    # 🚦 The batch is admitted once, for the most its own pool can run at a time,
+    # so its files never wait on each other for the user's budget
+    costs = sorted((admission.estimate_cost(uploads[i][1]) for i in order), reverse=True)
+    try:
+        with admission.controller.admit(user_id, sum(costs[:max_in_flight])):
+            for i in deferred_order:
+                filename, file_bytes = uploads[i]
+                job_id = jobs.enqueue(
+                    {
+                        'job_desc': job_desc,
+                        'user_id': user_id,
+                        'job_name': job_name,
+                        'id_MM_user': id_MM_user,
+                        'batch_id': batch_id
+                    },
+                    filename,
+                    file_bytes,
+                    priority=PRESCREEN_DEFER_PRIORITY
+                )
+                results[i] = {
+                    'filename': filename,
+                    'status': 'deferred',
+                    'job_id': job_id,
+                    'prescreen_score': round(scores[i], 1)
+                }
+
+            with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+                futures = {
+                    executor.submit(
+                        process_resume_file,
+                        uploads[i][1],
+                        uploads[i][0],
+                        job_desc,
+                        user_id,
+                        job_name,
+                        id_MM_user,
+                        batch_id,
+                        persist=False,
+                        include_timings=include_timings,
+                        prescreen_score=scores[i]
+                    ): i
+                    for i in order
+                }
+
+                for future in as_completed(futures):
+                    i = futures[future]
+                    filename = uploads[i][0]
+                    try:
+                        results[i] = {'filename': filename, 'status': 'ok', 'result': future.result()}
+                    except Exception as e:
+                        print(f"❌ Batch error for {filename}: {e}")
+                        traceback.print_exc()
+                        metrics.REQUEST_ERRORS.labels(endpoint="evaluate-resume-batch").inc()
+                        results[i] = {'filename': filename, 'status': 'error', 'error': str(e)}
+
+    except admission.Rejected as e:
+        return busy_response(e)
+
+    # ✅ Write every successful evaluation of the batch in one transaction
+    evaluated = [r for r in results if r['status'] == 'ok']
+    if evaluated:
+        no_description = job_desc == "!##NO DESCRIPTION##!"
+        try:
+            with metrics.stage("db"), get_connection() as conn:
+                persistence.save_evaluations(conn, [
+                    {
+                        'data': r['result'],
+                        'batch_id': batch_id,
+                        'id_MM_user': id_MM_user,
+                        'no_description': no_description
+                    }
+                    for r in evaluated
+                ])
+        except Exception as e:
+            print(f"❌ Batch save error: {e}")
+            traceback.print_exc()
+            for r in evaluated:
+                r['status'] = 'error'
+                r['error'] = f"Evaluation not saved: {e}"
+                del r['result']
+        else:
+            # background uploads, and inline ones that failed, fill the url in afterwards
+            for i, r in enumerate(results):
+                if r['status'] == 'ok' and (uploader.UPLOAD_MODE == "background" or r['result'].get('file_url') is None):
+                    filename, file_bytes = uploads[i]
+                    upload_in_background(r['result'], file_bytes, filename)
+
+    failed = sum(1 for r in results if r['status'] == 'error')
+    deferred = sum(1 for r in results if r['status'] == 'deferred')
+
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(results),
+        'succeeded': len(results) - failed - deferred,
+        'failed': failed,
+        'deferred': deferred,
+        'results': results
+    })
+
+@app.route('/bulk-runs', methods=['POST'])
+def create_bulk_run():
+    job_desc = request.form.get('job_desc')
+    user_id = request.form.get('user_id')
+    job_name = request.form.get('job_name')
+    id_MM_user = request.form.get('id_MM_user')
+    batch_id = request.form.get('batch_id') or request.form.get('batchId')
+    source_batch_id = request.form.get('source_batch_id')
+    provider = request.form.get('provider') or bulk.BULK_PROVIDER
+    upload = str(request.form.get('upload', 'true')).lower() == "true"
+
+    files = request.files.getlist('files') or request.files.getlist('file')
+    files = [f for f in files if f.filename != '']
+    if not files and not source_batch_id:
+        return jsonify({'error': 'No files or source_batch_id provided'}), 400
+    if files and not job_desc:
+        return jsonify({'error': 'No job description provided'}), 400
+
+    try:
+        # ✅ Read every file before anything is stored, a too large file rejects the whole run
+        uploads = [(f.filename, read_upload(f)) for f in files]
+
+        # 🟢 Uploaded files wait in the job table, reserved for the run, until a bulk runner takes them
+        if uploads:
+            batch_id = batch_id or source_batch_id or str(uuid.uuid4())
+            source_batch_id = batch_id
+        job_params = {
+            'job_desc': job_desc,
+            'user_id': user_id,
+            'job_name': job_name,
+            'id_MM_user': id_MM_user,
+            'batch_id': batch_id
+        }
+        params = {k: v for k, v in job_params.items() if v is not None}
+        params['source_batch_id'] = source_batch_id
+        params['upload'] = upload
+
+        # the files and the run are stored in one transaction, a failure leaves neither
+        # behind, and runners only see the run once all of its files are there
+        bulk.get_provider(provider)
+        jobs.ensure_schema()
+        bulk.ensure_schema()
+        run_id = str(uuid.uuid4())
+        with get_connection() as conn:
+            for filename, file_bytes in uploads:
+                jobs.enqueue(job_params, filename, file_bytes, owner=bulk.run_owner(run_id), conn=conn)
+            bulk.create_run(params, provider, run_id=run_id, conn=conn)
+
+        return jsonify({
+            'run_id': run_id,
+            'status': 'pending',
+            'files': len(uploads),
+            'status_url': f"/bulk-runs/{run_id}"
+        }), 202
+
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+    except bulk.BulkRunFailed as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        print(f"❌ Bulk run error: {e}")
+        traceback.print_exc()
+        metrics.REQUEST_ERRORS.labels(endpoint="bulk-runs").inc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/bulk-runs/<run_id>', methods=['GET'])
+def bulk_run_status(run_id):
+    try:
+        uuid.UUID(run_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid run id'}), 400
+
+    run = bulk.get_run(run_id)
+    if run is None:
+        return jsonify({'error': 'Run not found'}), 404
+
+    return jsonify(run)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid job id'}), 400
+
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job)
+
+@app.route('/candidates/search', methods=['GET'])
+def candidate_search():
+    # 🔍 owner is the user_id the candidates were evaluated under
+    owner_email = request.args.get('user_id') or request.args.get('owner_email')
+    if not owner_email:
+        return jsonify({'error': 'user_id is required'}), 400
+
+    try:
+        min_years = request.args.get('min_years', type=int)
+        limit = request.args.get('limit', search.SEARCH_DEFAULT_LIMIT, type=int)
+        with get_connection() as conn:
+            result = search.search_candidates(
+                conn,
+                owner_email,
+                skills=request.args.getlist('skill'),
+                title=request.args.get('title'),
+                company=request.args.get('company'),
+                location=request.args.get('location'),
+                min_years=min_years,
+                limit=limit,
+                cursor=request.args.get('cursor')
+            )
+        return jsonify(result)
+    except search.InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Candidate search failed: {e}")
+        traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(body, mimetype=content_type)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'evaluation_cache': eval_cache.get_stats(),
+        'text_store': text_store.get_stats()
+    })
+
+@app.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    return jsonify(admission.controller.get_stats())
+
+@app.route('/db/stats', methods=['GET'])
+def db_stats():
+    return jsonify(db.get_stats())
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
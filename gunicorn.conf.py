@@ -0,0 +1,49 @@
+# Picked up automatically by gunicorn from the working directory
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Threaded workers. An evaluation spends nearly all of its time waiting on OpenAI,
+# Gemini, the upload API and PostgreSQL, and all of those clients release the GIL
+# while they wait, so one worker holds GUNICORN_THREADS evaluations in flight.
+# The CPU heavy part, rendering pages for OCR, already runs in ocr.py's process pool.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Import the app once in the master, workers fork with every module already loaded.
+# Nothing in the import opens sockets or starts threads, those wait for post_fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    # runs in the master before the first worker is forked
+    if preload_app:
+        import flask1
+        flask1.warm_up()
+
+
+def post_fork(server, worker):
+    # each worker builds its own PostgreSQL pool, sockets must not cross a fork
+    import db
+    db.warm_pool()
+
+    # job worker threads must be started after the fork, threads do not survive it;
+    # an exception here is a boot error and would take the master down with it
+    import flask1
+    try:
+        flask1.start_job_workers()
+    except Exception as e:
+        print(f"❌ Job workers failed to start: {e}")
+    try:
+        flask1.start_bulk_runner()
+    except Exception as e:
+        print(f"❌ Bulk runner failed to start: {e}")
+
+
+def child_exit(server, worker):
+    # drop the exited worker's live gauges when metrics are aggregated across workers
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+
+import evaluation_schema
+import metrics
+import prompts
+import ratelimit
+from db import ensure_schema, get_connection
+from memory_cache import MemoryLRU
+
+# Compact job profile, extracted once per distinct job description and reused by
+# every resume evaluated against it, so each evaluation prompt carries a short
+# structured profile instead of the full description.
+
+JOB_PROFILE_ENABLED = os.getenv("JOB_PROFILE_ENABLED", "true").lower() == "true"
+JOB_PROFILE_MODEL = os.getenv("JOB_PROFILE_MODEL", "gpt-5-nano")
+JOB_PROFILE_MAX_ENTRIES = int(os.getenv("JOB_PROFILE_MAX_ENTRIES", "256"))
+# after a failed build the full description is used for this long before trying again
+JOB_PROFILE_FAILURE_TTL = float(os.getenv("JOB_PROFILE_FAILURE_TTL", "300"))
+# bump when PROFILE_PROMPT changes so old profiles are rebuilt
+PROFILE_VERSION = "v1"
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS job_profiles (
+        job_hash    TEXT PRIMARY KEY,
+        job_desc    TEXT NOT NULL,
+        profile     JSONB NOT NULL,
+        tokens      INTEGER NOT NULL DEFAULT 0,
+        created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+PROFILE_PROMPT = """Extract a compact hiring profile from the job description at the end of this message.
+Return raw JSON only (without any markdown formatting or labels) with these fields:
+title: job title
+seniority: one of intern, junior, mid, senior, lead, manager, executive
+min_years_experience: minimum years of experience required as an integer, 0 if not stated
+must_have_skills: list of required skills, short names only
+nice_to_have_skills: list of preferred skills, short names only
+keywords: up to 20 keywords a matching resume would contain
+responsibilities: up to 5 short phrases
+location: job location or null
+employment_type: permanent or contract or null
+
+Job Description:
+"""
+
+_lock = threading.Lock()
+_memory = MemoryLRU(JOB_PROFILE_MAX_ENTRIES)
+_inflight = {}  # job_hash -> lock, so a batch builds each profile only once
+_failed = {}  # job_hash -> monotonic time until which the build is not retried
+
+
+def job_hash(job_desc):
+    return hashlib.sha256(f"{PROFILE_VERSION}\n{job_desc}".encode("utf-8")).hexdigest()
+
+
+def _load(key):
+    ensure_schema(CREATE_TABLE_SQL)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT profile FROM job_profiles WHERE job_hash = %s", (key,))
+            row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _store(key, job_desc, profile, tokens):
+    ensure_schema(CREATE_TABLE_SQL)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO job_profiles (job_hash, job_desc, profile, tokens)
+                VALUES (%s, %s, %s::jsonb, %s)
+                ON CONFLICT (job_hash) DO NOTHING
+            """, (key, job_desc, json.dumps(profile, ensure_ascii=False), tokens))
+
+
+def _generate(client, job_desc):
+    prompt = PROFILE_PROMPT + job_desc
+    with metrics.stage("job_profile"):
+        response = ratelimit.call(
+            "openai",
+            lambda: client.responses.create(
+                model=JOB_PROFILE_MODEL,
+                input=prompt
+            ),
+            prompts.estimate_tokens(prompt) + ratelimit.OPENAI_OUTPUT_TOKENS,
+            usage=lambda r: r.usage.total_tokens
+        )
+    metrics.add_tokens("openai", response.usage.total_tokens)
+
+    profile, _ = evaluation_schema.repair(response.output_text)
+    return profile, response.usage.total_tokens
+
+
+def _recently_failed(key):
+    with _lock:
+        until = _failed.get(key)
+        if until is not None and until <= time.monotonic():
+            del _failed[key]
+            until = None
+    return until is not None
+
+
+def get_profile(client, job_desc):
+    # returns the profile dict, or None when profiles are off or cannot be built;
+    # callers then fall back to the full job description
+    if not JOB_PROFILE_ENABLED or not job_desc:
+        return None
+
+    key = job_hash(job_desc)
+    profile = _memory.get(key)
+    if profile is not None:
+        metrics.cache_event("job_profile", True)
+        return profile
+    if _recently_failed(key):
+        return None
+
+    with _lock:
+        inflight = _inflight.setdefault(key, threading.Lock())
+
+    with inflight:
+        # another thread of the same batch may have built it while we waited
+        profile = _memory.get(key)
+        if profile is not None:
+            metrics.cache_event("job_profile", True)
+            return profile
+        # or found that it cannot be built, the rest of the batch does not ask again
+        if _recently_failed(key):
+            return None
+
+        try:
+            profile = _load(key)
+            metrics.cache_event("job_profile", profile is not None)
+            if profile is None:
+                profile, tokens = _generate(client, job_desc)
+                _store(key, job_desc, profile, tokens)
+        except Exception:
+            traceback.print_exc()
+            with _lock:
+                _failed[key] = time.monotonic() + JOB_PROFILE_FAILURE_TTL
+            return None
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+
+        _memory.put(key, profile)
+        return profile
+
+
+def render_profile(profile):
+    # one line per field, lists comma separated, empty fields dropped
+    lines = []
+    for field in ("title", "seniority", "min_years_experience", "must_have_skills",
+                  "nice_to_have_skills", "keywords", "responsibilities", "location", "employment_type"):
+        value = profile.get(field)
+        if value in (None, "", [], 0) and field != "min_years_experience":
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        lines.append(f"{field}: {value}")
+    return "\n".join(lines)
@@ -0,0 +1,338 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+import db
+from db import get_connection
+
+# Durable evaluation queue backed by Postgres.
+# Jobs are claimed with FOR UPDATE SKIP LOCKED so any number of workers, in any
+# number of processes, can pull from the same table without double processing.
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+# A running job whose worker has not finished within this window is considered
+# abandoned (crash, redeploy) and is picked up again
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+# a worker renews its lock this often while the handler runs, so long jobs are not reclaimed
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", str(JOB_LOCK_TIMEOUT / 4)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS evaluation_jobs (
+        job_id       UUID PRIMARY KEY,
+        status       TEXT NOT NULL DEFAULT 'queued',
+        priority     INTEGER NOT NULL DEFAULT 0,
+        params       JSONB NOT NULL,
+        filename     TEXT,
+        file_bytes   BYTEA,
+        attempts     INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        last_error   TEXT,
+        result       JSONB,
+        run_after    TIMESTAMPTZ NOT NULL DEFAULT now(),
+        locked_at    TIMESTAMPTZ,
+        locked_by    TEXT,
+        created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    ALTER TABLE evaluation_jobs ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS evaluation_jobs_claim_priority_idx
+        ON evaluation_jobs (status, priority DESC, created_at);
+"""
+
+CLAIM_SQL = """
+    UPDATE evaluation_jobs
+    SET status = 'running',
+        attempts = attempts + 1,
+        locked_at = now(),
+        locked_by = %s,
+        updated_at = now()
+    WHERE job_id = (
+        SELECT job_id FROM evaluation_jobs
+        WHERE (status = 'queued' AND run_after <= now())
+           OR (status = 'running' AND locked_at < now() - make_interval(secs => %s)
+               AND attempts < max_attempts)
+        ORDER BY priority DESC, created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING job_id, params, filename, file_bytes, attempts, max_attempts
+"""
+
+# an abandoned job that already used its last attempt most likely took its worker
+# down (OOM, a crash in fitz), it is not retried again
+FAIL_ABANDONED_SQL = """
+    UPDATE evaluation_jobs
+    SET status = 'failed',
+        last_error = 'Worker stopped responding on the last attempt',
+        file_bytes = NULL,
+        locked_at = NULL,
+        locked_by = NULL,
+        updated_at = now()
+    WHERE status = 'running'
+      AND locked_at < now() - make_interval(secs => %s)
+      AND attempts >= max_attempts
+"""
+
+class PermanentJobError(Exception):
+    pass
+
+
+def ensure_schema():
+    db.ensure_schema(CREATE_TABLE_SQL)
+
+
+def enqueue(params, filename, file_bytes, priority=0, owner=None, conn=None):
+    # higher priority is claimed first, equal priority in arrival order;
+    # with an owner the job is reserved for that bulk run instead (see claim_batch)
+    ensure_schema()
+    job_id = str(uuid.uuid4())
+    with db.use_connection(conn) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO evaluation_jobs (job_id, status, params, filename, file_bytes, max_attempts, priority, locked_by)
+                VALUES (%s, %s, %s::jsonb, %s, %s, %s, %s, %s)
+            """, (job_id, "bulk" if owner else "queued", json.dumps(params), filename, file_bytes,
+                  JOB_MAX_ATTEMPTS, priority, owner))
+    return job_id
+
+
+def get_job(job_id):
+    ensure_schema()
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT job_id, status, attempts, max_attempts, last_error, result,
+                       filename, created_at, updated_at
+                FROM evaluation_jobs
+                WHERE job_id = %s
+            """, (job_id,))
+            row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        "job_id": str(row[0]),
+        "status": row[1],
+        "attempts": row[2],
+        "max_attempts": row[3],
+        "error": row[4],
+        "result": row[5],
+        "filename": row[6],
+        "created_at": row[7],
+        "updated_at": row[8],
+    }
+
+
+def claim(worker_id):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(FAIL_ABANDONED_SQL, (JOB_LOCK_TIMEOUT,))
+            cursor.execute(CLAIM_SQL, (worker_id, JOB_LOCK_TIMEOUT))
+            row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        "job_id": str(row[0]),
+        "params": row[1],
+        "filename": row[2],
+        "file_bytes": bytes(row[3]) if row[3] is not None else None,
+        "attempts": row[4],
+        "max_attempts": row[5],
+    }
+
+
+def claim_batch(batch_id, owner):
+    # hands every queued job of a batch to a bulk run (bulk.py); status 'bulk' keeps them
+    # out of CLAIM_SQL however long the provider batch takes, a restarted run gets its
+    # own jobs back
+    ensure_schema()
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE evaluation_jobs
+                SET status = 'bulk',
+                    attempts = CASE WHEN status = 'bulk' THEN attempts ELSE attempts + 1 END,
+                    locked_at = now(),
+                    locked_by = %s,
+                    updated_at = now()
+                WHERE params->>'batch_id' = %s
+                  AND (status = 'queued' OR (status = 'bulk' AND locked_by = %s))
+                RETURNING job_id, params, filename, attempts, max_attempts
+            """, (owner, batch_id, owner))
+            rows = cursor.fetchall()
+
+    return [
+        {
+            "job_id": str(row[0]),
+            "params": row[1],
+            "filename": row[2],
+            "attempts": row[3],
+            "max_attempts": row[4],
+        }
+        for row in sorted(rows, key=lambda row: str(row[0]))
+    ]
+
+
+def release(owner, error):
+    # jobs a bulk run took but did not finish are queued again for the normal workers
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE evaluation_jobs
+                SET status = 'queued',
+                    last_error = %s,
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = now()
+                WHERE status = 'bulk' AND locked_by = %s
+            """, (str(error), owner))
+
+
+def get_file(job_id):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT file_bytes FROM evaluation_jobs WHERE job_id = %s", (job_id,))
+            row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else None
+
+
+def complete(job_id, result, conn=None):
+    with db.use_connection(conn) as conn:
+        with conn.cursor() as cursor:
+            # the file is no longer needed once the evaluation is stored
+            cursor.execute("""
+                UPDATE evaluation_jobs
+                SET status = 'done',
+                    result = %s::jsonb,
+                    file_bytes = NULL,
+                    last_error = NULL,
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = now()
+                WHERE job_id = %s
+            """, (json.dumps(result, ensure_ascii=False, default=str), job_id))
+
+
+def fail(job, error, permanent=False, conn=None):
+    retry = not permanent and job["attempts"] < job["max_attempts"]
+
+    # jittered exponential backoff so a provider outage does not retry in lockstep
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1)))
+    delay = random.uniform(delay / 2, delay)
+
+    with db.use_connection(conn) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE evaluation_jobs
+                SET status = %s,
+                    last_error = %s,
+                    run_after = now() + make_interval(secs => %s),
+                    file_bytes = CASE WHEN %s THEN file_bytes ELSE NULL END,
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = now()
+                WHERE job_id = %s
+            """, ("queued" if retry else "failed", str(error), delay, retry, job["job_id"]))
+
+
+def heartbeat(job_id, worker_id):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE evaluation_jobs
+                SET locked_at = now()
+                WHERE job_id = %s AND locked_by = %s AND status = 'running'
+            """, (job_id, worker_id))
+
+
+@contextmanager
+def _heartbeat(job_id, worker_id):
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                heartbeat(job_id, worker_id)
+            except Exception as e:
+                print(f"⚠️ Job {job_id} heartbeat failed: {e}")
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_once(handler, worker_id):
+    job = claim(worker_id)
+    if job is None:
+        return False
+
+    try:
+        with _heartbeat(job["job_id"], worker_id):
+            result = handler(job)
+    except PermanentJobError as e:
+        print(f"❌ Job {job['job_id']} failed permanently: {e}")
+        fail(job, e, permanent=True)
+    except Exception as e:
+        print(f"❌ Job {job['job_id']} attempt {job['attempts']} failed: {e}")
+        traceback.print_exc()
+        fail(job, e)
+    else:
+        complete(job["job_id"], result)
+    return True
+
+
+def _worker_loop(handler, worker_id, stop_event):
+    while not stop_event.is_set():
+        try:
+            # created here rather than at start up, so a database that is down at boot
+            # only delays the workers
+            ensure_schema()
+            if not run_once(handler, worker_id):
+                stop_event.wait(JOB_POLL_INTERVAL)
+        except Exception:
+            # database unavailable or similar, keep the worker alive and try again
+            traceback.print_exc()
+            stop_event.wait(JOB_POLL_INTERVAL * 5)
+
+
+def start_workers(handler, count, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = []
+    for i in range(count):
+        t = threading.Thread(
+            target=_worker_loop,
+            args=(handler, f"{prefix}:{i}", stop_event),
+            name=f"job-worker-{i}",
+            daemon=True
+        )
+        t.start()
+        threads.append(t)
+    return threads, stop_event
+
+
+def run_workers(handler, count):
+    threads, stop_event = start_workers(handler, count)
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for t in threads:
+            t.join()
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Prometheus metrics for the evaluation pipeline.
+# With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR so /metrics reports
+# the sum over all workers instead of whichever worker answered the scrape.
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "resume_stage_seconds",
+    "Time spent in each stage of a resume evaluation",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "resume_stage_errors_total",
+    "Exceptions raised inside a stage",
+    ["stage"]
+)
+TOKENS = Counter(
+    "resume_llm_tokens_total",
+    "Tokens reported by the LLM providers",
+    ["provider"]
+)
+OCR_FALLBACKS = Counter(
+    "resume_ocr_fallback_total",
+    "Documents that needed Gemini OCR for at least one page"
+)
+OCR_PAGES = Counter(
+    "resume_ocr_pages_total",
+    "Pages sent to Gemini OCR"
+)
+PROMPT_TOKENS = Counter(
+    "resume_prompt_tokens_total",
+    "Estimated tokens in the evaluation prompts sent to OpenAI"
+)
+PROMPT_TOKENS_SAVED = Counter(
+    "resume_prompt_tokens_saved_total",
+    "Estimated prompt tokens removed by normalization, de-duplication and the token budget"
+)
+PRESCREEN_SKIPS = Counter(
+    "resume_prescreen_skipped_total",
+    "Resumes answered by the local pre-screen without an LLM call"
+)
+CACHE_EVENTS = Counter(
+    "resume_cache_events_total",
+    "Lookups against the evaluation cache and the text store",
+    ["cache", "result"]
+)
+JSON_REPAIRS = Counter(
+    "resume_json_repairs_total",
+    "Evaluation responses by how they were parsed: valid, repaired, reformatted, fields_reasked, failed",
+    ["result"]
+)
+RATE_LIMIT_RETRIES = Counter(
+    "resume_rate_limit_retries_total",
+    "Provider calls retried after a 429 or 503",
+    ["provider"]
+)
+REQUEST_ERRORS = Counter(
+    "resume_request_errors_total",
+    "Requests that ended with an error response",
+    ["endpoint"]
+)
+
+_local = threading.local()
+
+
+@contextmanager
+def collect_timings():
+    # per request breakdown, nested calls on the same thread share the outer dict
+    outer = getattr(_local, "timings", None)
+    if outer is not None:
+        yield outer
+        return
+
+    timings = {}
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage=name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            timings[f"{name}_ms"] = round(timings.get(f"{name}_ms", 0) + elapsed * 1000, 1)
+
+
+def add_tokens(provider, count):
+    if count:
+        TOKENS.labels(provider=provider).inc(count)
+
+
+def cache_event(cache, hit):
+    CACHE_EVENTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_latest():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,208 @@
+import math
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import ratelimit
+
+# Gemini OCR engine.
+# Pages are rendered at a DPI chosen from their size (Gemini tiles images anyway,
+# so anything past a few megapixels only costs memory and CPU), encoded straight
+# to JPEG/PNG bytes and handed to Gemini without a PIL round trip.
+
+OCR_MODEL = os.getenv("OCR_MODEL", "gemini-2.0-flash")
+OCR_TARGET_MEGAPIXELS = float(os.getenv("OCR_TARGET_MEGAPIXELS", "4"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "500"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "jpeg").lower()
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+OCR_RENDER_PROCESSES = int(os.getenv("OCR_RENDER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+OCR_MEMORY_BUDGET_MB = int(os.getenv("OCR_MEMORY_BUDGET_MB", "256"))
+
+OCR_PROMPT = """
+    you are an ocr tools that extract resume. dont add anything and only return the resume
+    """
+
+MIME_TYPES = {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+class OCRBudgetExceeded(ValueError):
+    pass
+
+
+_gemini_lock = threading.Lock()
+_gemini_configured = False
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _get_pool():
+    # one render pool per process, a pool inherited through fork is not usable.
+    # spawn, because forking a web worker that already runs threads can deadlock
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def gemini_model(model_name=OCR_MODEL):
+    # the Gemini SDK is slow to import and only needed for scanned pages
+    global _gemini_configured
+    import google.generativeai as genai
+    with _gemini_lock:
+        if not _gemini_configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _gemini_configured = True
+    return genai.GenerativeModel(model_name)
+
+
+def _open(source):
+    import fitz
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _channels():
+    return 1 if OCR_GRAYSCALE else 3
+
+
+def choose_dpi(width_pt, height_pt, max_dpi=OCR_MAX_DPI):
+    # DPI that lands the page near the target pixel count, within [min, max]
+    area_in = (width_pt / 72) * (height_pt / 72)
+    dpi = math.sqrt(OCR_TARGET_MEGAPIXELS * 1_000_000 / area_in) if area_in > 0 else max_dpi
+    return int(max(OCR_MIN_DPI, min(max_dpi, dpi)))
+
+
+def raw_page_bytes(width_pt, height_pt, dpi):
+    zoom = dpi / 72
+    return int(width_pt * zoom) * int(height_pt * zoom) * _channels()
+
+
+def plan_pages(doc, max_dpi=OCR_MAX_DPI, page_numbers=None):
+    # returns [(page_index, dpi)], lowering DPI where the raw pixmaps of the pages
+    # rendered at the same time would not fit in the memory budget
+    budget = OCR_MEMORY_BUDGET_MB * 1024 * 1024
+    concurrent_pages = max(1, OCR_RENDER_PROCESSES)
+    per_page_budget = budget / concurrent_pages
+
+    plan = []
+    indexes = page_numbers if page_numbers is not None else range(doc.page_count)
+    for i in indexes:
+        rect = doc[i].rect
+        dpi = choose_dpi(rect.width, rect.height, max_dpi)
+        raw = raw_page_bytes(rect.width, rect.height, dpi)
+        if raw > per_page_budget:
+            dpi = int(dpi * math.sqrt(per_page_budget / raw))
+            if dpi < 72:
+                raise OCRBudgetExceeded(f"Page {i + 1} does not fit in the OCR memory budget")
+        plan.append((i, dpi))
+    return plan
+
+
+def render_page(source, page_index, dpi, grayscale=OCR_GRAYSCALE, image_format=OCR_IMAGE_FORMAT,
+                jpeg_quality=OCR_JPEG_QUALITY):
+    # source is a file path or the PDF bytes, runs inside the render pool
+    import fitz
+    doc = _open(source)
+    try:
+        zoom = dpi / 72
+        pix = doc[page_index].get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom),
+            colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+            alpha=False
+        )
+        if image_format == "jpeg":
+            return pix.tobytes("jpeg", jpg_quality=jpeg_quality)
+        return pix.tobytes("png")
+    finally:
+        doc.close()
+
+
+def _page_source(doc, source, page_index):
+    # what a render process receives for one page: the file path, or a one page copy
+    # of the PDF instead of pickling the whole document once per page
+    if isinstance(source, str):
+        return source, page_index
+    import fitz
+    page_doc = fitz.open()
+    try:
+        page_doc.insert_pdf(doc, from_page=page_index, to_page=page_index)
+        return page_doc.tobytes(garbage=3, deflate=True), 0
+    finally:
+        page_doc.close()
+
+
+def render_pages(source, max_dpi=OCR_MAX_DPI, page_numbers=None):
+    # encoded pages are kept until the Gemini call, they count against the budget too
+    budget = OCR_MEMORY_BUDGET_MB * 1024 * 1024
+    images = []
+    total = 0
+
+    def keep(data):
+        nonlocal total
+        total += len(data)
+        if total > budget:
+            raise OCRBudgetExceeded("Rendered pages exceed the OCR memory budget")
+        images.append(data)
+
+    doc = _open(source)
+    try:
+        plan = plan_pages(doc, max_dpi, page_numbers)
+
+        if OCR_RENDER_PROCESSES > 1 and len(plan) > 1:
+            pool = _get_pool()
+            # at most one page per render process in flight, which is what plan_pages
+            # sized the DPI for; results are collected in page order as they come back
+            in_flight = deque()
+            try:
+                for i, dpi in plan:
+                    if len(in_flight) >= OCR_RENDER_PROCESSES:
+                        keep(in_flight.popleft().result())
+                    page_source, page_index = _page_source(doc, source, i)
+                    in_flight.append(pool.submit(render_page, page_source, page_index, dpi))
+                while in_flight:
+                    keep(in_flight.popleft().result())
+            finally:
+                for future in in_flight:
+                    future.cancel()
+        else:
+            for i, dpi in plan:
+                keep(render_page(source, i, dpi))
+    finally:
+        doc.close()
+    return images
+
+
+def ocr_document(source, max_dpi=OCR_MAX_DPI, page_numbers=None):
+    with metrics.stage("ocr_render"):
+        images = render_pages(source, max_dpi, page_numbers)
+    if not images:
+        return "", 0
+
+    mime_type = MIME_TYPES.get(OCR_IMAGE_FORMAT, "image/png")
+    parts = [{"mime_type": mime_type, "data": data} for data in images]
+
+    model = gemini_model()
+    estimated = len(parts) * ratelimit.GEMINI_IMAGE_TOKENS + ratelimit.GEMINI_OUTPUT_TOKENS
+    with metrics.stage("gemini"):
+        response = ratelimit.call(
+            "gemini",
+            lambda: model.generate_content([OCR_PROMPT, *parts]),
+            estimated,
+            usage=lambda r: r.usage_metadata.total_token_count
+        )
+
+    tokens = response.usage_metadata.total_token_count
+    metrics.add_tokens("gemini", tokens)
+    return response.text, tokens
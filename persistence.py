@@ -0,0 +1,262 @@
+import uuid
+from psycopg2.extras import RealDictCursor, execute_values
+
+# Set based writes for evaluated resumes.
+# Every statement relies on the unique indexes in sql/001_persistence_constraints.sql,
+# run that migration before deploying this module.
+
+UPSERT_CANDIDATE_SQL = """
+    INSERT INTO candidates (
+        candidate_id, owner_email, full_name, current_company, notes, current_title,
+        location, candidate_email, phone, resume_url, user_id, created_at
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now())
+    ON CONFLICT (owner_email, candidate_email) DO UPDATE
+    SET current_company = EXCLUDED.current_company,
+        current_title = EXCLUDED.current_title,
+        updated_at = now()
+    RETURNING candidate_id, (xmax = 0) AS inserted
+"""
+
+INSERT_SKILLS_SQL = """
+    INSERT INTO candidate_skills (
+        candidate_id, skill_name, proficiency, years_experience, last_used_year, created_at
+    ) VALUES %s
+    ON CONFLICT (candidate_id, skill_name) DO NOTHING
+"""
+
+# Update the row for the current company if there is one, otherwise insert it,
+# in a single round trip
+UPSERT_CURRENT_EXPERIENCE_SQL = """
+    WITH updated AS (
+        UPDATE candidate_experience
+        SET company = %(company)s,
+            description = %(description)s,
+            title = %(title)s,
+            start_year = %(start_year)s,
+            start_month = %(start_month)s,
+            employment_type = %(employment_type)s,
+            end_year = NULL,
+            end_month = NULL,
+            is_current = TRUE,
+            updated_at = now()
+        WHERE candidate_id = %(candidate_id)s AND company = %(company)s
+        RETURNING 1
+    )
+    INSERT INTO candidate_experience (
+        candidate_id, company, title, description,
+        start_year, start_month, end_year, end_month, employment_type, is_current, created_at
+    )
+    SELECT %(candidate_id)s, %(company)s, %(title)s, %(description)s,
+           %(start_year)s, %(start_month)s, NULL, NULL, %(employment_type)s, TRUE, now()
+    WHERE NOT EXISTS (SELECT 1 FROM updated)
+"""
+
+# Past companies already stored for the candidate are skipped by the partial unique index
+INSERT_PAST_EXPERIENCE_SQL = """
+    INSERT INTO candidate_experience (
+        candidate_id, company, title, description,
+        start_year, start_month, end_year, end_month, is_current, created_at
+    ) VALUES %s
+    ON CONFLICT (candidate_id, company) WHERE is_current = FALSE DO NOTHING
+"""
+
+INSERT_TRACK_SQL = """
+    INSERT INTO candidate_track (user_id, resume_id)
+    VALUES %s
+    ON CONFLICT (user_id, resume_id) DO NOTHING
+"""
+
+INSERT_BATCH_SQL = """
+    INSERT INTO log_history_batch (batch_id, created_by)
+    VALUES %s
+    ON CONFLICT (batch_id) DO NOTHING
+"""
+
+INSERT_LOG_HISTORY_SQL = """
+    INSERT INTO LOG_HISTORY (
+        "LOG_HISTORY_ID", user_id, date_run, title, job_description,
+        file_url, name, email, phone_no, match_percentage,
+        short_desc, is_shortlisted, gpt_token, gemini_token, match_acceptance, batch_id
+    ) VALUES %s
+"""
+
+
+def _item(values, i):
+    return values[i] if i < len(values) else None
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else []
+
+
+def _has_current_start(data):
+    current_year = data.get("current_comp_year")
+    current_month = data.get("current_comp_month")
+    # Only consider a "current job" entry when we have both start year & month (and valid > 0)
+    return (isinstance(current_year, int) and isinstance(current_month, int)
+            and current_year > 0 and current_month > 0)
+
+
+def _past_experience_rows(candidate_id, data):
+    past_companies = _as_list(data.get("past_company"))
+    past_titles = _as_list(data.get("past_title"))
+    past_descriptions = _as_list(data.get("description"))
+    start_years = _as_list(data.get("start_year"))
+    start_months = _as_list(data.get("start_month"))
+    end_years = _as_list(data.get("end_year"))
+    end_months = _as_list(data.get("end_month"))
+
+    rows = []
+    for i, company in enumerate(past_companies):
+        end_year = _item(end_years, i)
+        # month without year is meaningless, and no end date at all means a current job
+        end_month = _item(end_months, i) if end_year is not None else None
+        is_current = end_year is None
+
+        rows.append((
+            candidate_id,
+            company,
+            _item(past_titles, i),
+            _item(past_descriptions, i),
+            _item(start_years, i),
+            _item(start_months, i),
+            end_year,
+            end_month,
+            is_current
+        ))
+    return rows
+
+
+def _skill_rows(candidate_id, data):
+    skills = _as_list(data.get("skill"))
+    proficiency = _as_list(data.get("proficiency"))
+    years_exp = _as_list(data.get("years_experience"))
+    last_used = _as_list(data.get("last_used_year"))
+
+    return [
+        (candidate_id, skill, _item(proficiency, i), _item(years_exp, i), _item(last_used, i))
+        for i, skill in enumerate(skills)
+    ]
+
+
+def _log_history_row(data, batch_id):
+    return (
+        data["LOG_HISTORY_ID"],
+        data["user_id"],
+        data["date"],
+        data["title"],
+        data["job_desription"],
+        data["file_url"],
+        data["name"],
+        data["email"],
+        data["phone_number"],
+        data["percentage_match"],
+        data["short_description"],
+        0,
+        data["total_token_openai"],
+        data["total_token_gemini"],
+        data["match_acceptence"],
+        batch_id
+    )
+
+
+def _save_candidate(cursor, data):
+    cursor.execute(UPSERT_CANDIDATE_SQL, (
+        str(uuid.uuid4()),
+        data.get("user_id"),
+        data.get("name"),
+        data.get("company"),
+        data.get("current_description"),
+        data.get("title"),
+        data.get("location"),
+        data.get("email"),
+        data.get("phone_number"),
+        data.get("file_url"),
+        data.get("user_id")
+    ))
+    row = cursor.fetchone()
+    candidate_id = row["candidate_id"]
+
+    # skills are only recorded the first time we see a candidate
+    if row["inserted"]:
+        skill_rows = _skill_rows(candidate_id, data)
+        if skill_rows:
+            execute_values(cursor, INSERT_SKILLS_SQL, skill_rows,
+                           template="(%s, %s, %s, %s, %s, now())")
+
+    if _has_current_start(data):
+        cursor.execute(UPSERT_CURRENT_EXPERIENCE_SQL, {
+            "candidate_id": candidate_id,
+            "company": data.get("company"),
+            "title": data.get("title"),
+            "description": data.get("current_description"),
+            "start_year": data.get("current_comp_year"),
+            "start_month": data.get("current_comp_month"),
+            "employment_type": data.get("employment_type"),
+        })
+
+    past_rows = _past_experience_rows(candidate_id, data)
+    if past_rows:
+        execute_values(cursor, INSERT_PAST_EXPERIENCE_SQL, past_rows,
+                       template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, now())")
+
+    return candidate_id
+
+
+def save_evaluations(conn, evaluations):
+    # evaluations: list of dicts with data, batch_id, id_MM_user and no_description.
+    # Everything is written on the caller's connection, the caller commits once.
+    if not evaluations:
+        return []
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        batches = {}
+        for ev in evaluations:
+            batches.setdefault(ev["batch_id"], ev["data"].get("user_id"))
+        execute_values(cursor, INSERT_BATCH_SQL, list(batches.items()))
+
+        log_rows = [
+            _log_history_row(ev["data"], ev["batch_id"])
+            for ev in evaluations
+            if not ev["no_description"]
+        ]
+        if log_rows:
+            execute_values(cursor, INSERT_LOG_HISTORY_SQL, log_rows)
+
+        candidate_ids = []
+        track_rows = set()
+        for ev in evaluations:
+            # screened out locally, nothing reliable to store about the candidate
+            if ev["data"].get("prescreen_skipped"):
+                candidate_ids.append(None)
+                continue
+            candidate_id = _save_candidate(cursor, ev["data"])
+            candidate_ids.append(candidate_id)
+            track_rows.add((ev["id_MM_user"], candidate_id))
+
+        if track_rows:
+            execute_values(cursor, INSERT_TRACK_SQL, sorted(track_rows, key=str))
+
+    return candidate_ids
+
+
+def set_file_url(conn, log_history_id, owner_email, candidate_email, url):
+    # used when the file upload finishes after the evaluation was written
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE LOG_HISTORY SET file_url = %s WHERE "LOG_HISTORY_ID" = %s
+        """, (url, log_history_id))
+        cursor.execute("""
+            UPDATE candidates
+            SET resume_url = %s
+            WHERE owner_email = %s AND candidate_email = %s AND resume_url IS NULL
+        """, (url, owner_email, candidate_email))
+
+
+def save_evaluation(conn, data, batch_id, id_MM_user, no_description):
+    return save_evaluations(conn, [{
+        "data": data,
+        "batch_id": batch_id,
+        "id_MM_user": id_MM_user,
+        "no_description": no_description,
+    }])[0]
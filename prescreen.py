@@ -0,0 +1,128 @@
+import os
+import re
+from collections import Counter
+
+# Local lexical pre-screen.
+# BM25 style term saturation of the job terms over the resume text, vectorized with
+# NumPy, gives a preliminary percentage_match in well under a millisecond per resume.
+# Resumes under PRESCREEN_FLOOR share almost nothing with the job and can skip the LLM.
+
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "false").lower() == "true"
+PRESCREEN_FLOOR = float(os.getenv("PRESCREEN_FLOOR", "10"))
+# skip: answer below-floor resumes locally without the LLM
+# defer: in batches, queue below-floor resumes as low priority jobs instead
+PRESCREEN_MODE = os.getenv("PRESCREEN_MODE", "skip").lower()
+# IDF needs a corpus; below this many documents every job term weighs the same
+PRESCREEN_MIN_CORPUS = int(os.getenv("PRESCREEN_MIN_CORPUS", "5"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could do does
+for from has have having he her his how i if in into is it its job may more most must
+need new no not of on or our out over role should so some such than that the their them
+then there these they this those to under up us we well were what when where which while
+who will with work working would you your years year experience team ability strong good
+including etc able within across per
+""".split())
+
+
+def tokenize(text):
+    if not text:
+        return []
+    tokens = (t.rstrip(".") for t in _TOKEN.findall(text.lower()))
+    return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
+
+
+def scores(query_text, documents):
+    # returns a 0-100 float array, one score per document
+    import numpy as np
+    terms = sorted(set(tokenize(query_text)))
+    if not terms or not documents:
+        return np.zeros(len(documents))
+
+    index = {t: i for i, t in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float32)
+    lengths = np.zeros(len(documents), dtype=np.float32)
+    for d, doc in enumerate(documents):
+        tokens = tokenize(doc)
+        lengths[d] = len(tokens)
+        for term, count in Counter(tokens).items():
+            i = index.get(term)
+            if i is not None:
+                tf[d, i] = count
+
+    n = len(documents)
+    if n >= PRESCREEN_MIN_CORPUS:
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    else:
+        idf = np.ones(len(terms), dtype=np.float32)
+
+    avg_length = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[:, None] / avg_length)
+    saturation = tf * (BM25_K1 + 1) / (tf + norm)
+
+    # one occurrence in an average length resume saturates to ~1, so a resume that
+    # mentions every job term once scores ~100
+    matched = np.minimum(saturation, 1.0) @ idf
+    return 100.0 * matched / idf.sum()
+
+
+def score(query_text, document):
+    return float(scores(query_text, [document])[0])
+
+
+def query_text(job_desc, profile=None):
+    # the profile terms are what the job really asks for, weigh them in twice
+    if not profile:
+        return job_desc
+    extra = []
+    for field in ("title", "must_have_skills", "keywords"):
+        value = profile.get(field)
+        if isinstance(value, list):
+            extra.extend(str(v) for v in value)
+        elif value:
+            extra.append(str(value))
+    return job_desc + "\n" + " ".join(extra)
+
+
+def below_floor(value):
+    return PRESCREEN_ENABLED and value is not None and value < PRESCREEN_FLOOR
+
+
+def skipped_evaluation(value):
+    # stands in for the LLM answer when a resume is screened out locally
+    return {
+        "name": None,
+        "title": None,
+        "job_desription": None,
+        "email": None,
+        "company": None,
+        "past_company": [],
+        "description": [],
+        "past_title": [],
+        "current_description": None,
+        "current_comp_year": 0,
+        "current_comp_month": 0,
+        "start_year": [],
+        "start_month": [],
+        "end_year": [],
+        "end_month": [],
+        "employment_type": None,
+        "location": None,
+        "phone_number": None,
+        "skill": [],
+        "proficiency": [],
+        "years_experience": [],
+        "last_used_year": [],
+        "percentage_match": int(round(value)),
+        "short_description": (
+            "The resume shares almost nothing with the job description and was screened out locally."
+            "<br><b>Ai Suggestion : <span class='text-danger'>Not recommended to be hired</span></b>"
+        ),
+        "prescreen_skipped": True,
+    }
@@ -0,0 +1,210 @@
+import math
+import os
+import re
+from collections import Counter
+
+# Evaluation prompt construction.
+# The static instructions come first and are byte-identical between calls, so the
+# provider can reuse the cached prefix; the job description follows (shared across a
+# batch) and the resume, the only part unique to the call, goes last.
+
+PROMPT_RESUME_TOKEN_BUDGET = int(os.getenv("PROMPT_RESUME_TOKEN_BUDGET", "6000"))
+PROMPT_JOB_TOKEN_BUDGET = int(os.getenv("PROMPT_JOB_TOKEN_BUDGET", "2000"))
+# rough OpenAI ratio for English text, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+NO_DESCRIPTION = "!##NO DESCRIPTION##!"
+
+FIELDS_COMMON = """Return the following fields in the JSON:
+name: Full name of the candidate
+title: current job title
+job_desription: the job description
+email: Email address
+company: current company
+past_company: list of all past companies as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
+description: list of all past description of the candidate work as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
+past_title: job title held before as a valid JSON array of strings (e.g. ["Company A", "Company B"]) without the key (i.e. 0, 1, 2)
+current_description: current company description
+"""
+
+EVALUATION_INSTRUCTIONS = """You are a resume evaluator. The job description and the resume are given at the end of this message.
+Analyze the resume against the job description and return your evaluation in raw JSON format only (without any markdown formatting or labels).
+""" + FIELDS_COMMON + """current_comp_year: current company start year must be in integer
+current_comp_month: current company start month must be in integer in range of 1 to 12
+start_year: list of all start year of all past company and title
+start_month: list of all start month of all past company and title must be in integer in range of 1 to 12
+end_year: list of all end year of all past company and title must be null if for current company
+end_month: list of all end year of all past company and title must be in integer in range of 1 to 12 must be null if for current company
+employment_type: permanent or contract
+location: current company location
+phone_number: Phone number
+skill: list down 5 skill that the candidate have
+proficiency: proficiency of the 5 skill you listed
+years_experience: years experience for the 5 skill you listed must return in list for each skill
+last_used_year: last used year for 5 skill u listed
+percentage_match: An integer percentage (0–100) representing how well the resume matches the job description
+short_description: A 1–2 sentence summary of the candidate relevant to the job and you must include whether
+<b>Ai Suggestion : <span class='text-success'>Can be hired </span> </b> if percentage_match above {acceptance} or
+<b>Ai Suggestion : <span class='text-danger'>Not recommended to be hired</span></b> below
+do <br> before the ai suggestion html script
+"""
+
+EXTRACTION_INSTRUCTIONS = """You are a resume evaluator. The resume is given at the end of this message.
+Analyze the resume and return in raw JSON format only (without any markdown formatting or labels).
+if they dont put any year or month just assume they dont have a current company and put all in past company and title
+""" + FIELDS_COMMON + """current_comp_year: current company start year must be in integer if null must return 0 and dont make up any answer must be based on resume
+current_comp_month: current company start month must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
+start_year: list of all start year of all past company and title and dont make up any answer must be based on resume if null must return 0
+start_month: list of all start month of all past company and title must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
+end_year: list of all end year of all past company and title and dont make up any answer must be based on resume if null must return 0
+end_month: list of all end year of all past company and title must be in integer in range of 1 to 12 if null must return 0 and dont make up any answer must be based on resume
+employment_type: permanent or contract
+location: current company location
+phone_number: Phone number
+skill: list down 5 skill that the candidate have
+proficiency: proficiency of the 5 skill you listed
+years_experience: years experience for the 5 skill you listed must return in list for each skill or return null if you dont know
+last_used_year: last used year for 5 skill u listed or return null if you dont know
+percentage_match: put 0 only
+short_description: A 1–2 sentence summary of the about candidate
+"""
+
+REFORMAT_INSTRUCTIONS = """The text at the end of this message was meant to be one JSON object but is not valid JSON.
+Return the same content as raw valid JSON only (without any markdown formatting or labels).
+Keep every field and value, do not add or change any information, and drop anything that is cut off.
+Expected fields: {fields}
+
+Text:
+"""
+
+MISSING_FIELDS_INSTRUCTIONS = """
+Your previous answer was missing some fields. Return raw JSON only (without any markdown formatting or labels)
+containing only these fields, as described above: {fields}
+"""
+
+# "Page 2", "2 of 5", "2/5" or a bare small number; years, dates and phone numbers are longer
+_PAGE_NUMBER = re.compile(r"^(page\s*)?(\d{1,3})(\s*(of|/)\s*(\d{1,3}))?$", re.IGNORECASE)
+_INLINE_SPACE = re.compile(r"[ \t\u00a0\u200b]+")
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+# extraction joins pages with a form feed
+PAGE_BREAK = "\f"
+# lines at the top and bottom of a page where headers, footers and page numbers live
+PAGE_EDGE_LINES = 3
+# a header or footer repeats on at least this many pages
+RUNNING_MIN_PAGES = 3
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _is_page_number(line):
+    match = _PAGE_NUMBER.match(line)
+    if not match:
+        return False
+    return match.group(5) is None or int(match.group(2)) <= int(match.group(5))
+
+
+def _page_edges(lines):
+    # indexes of the first and last non-empty lines of a page, fewer on short pages
+    filled = [i for i, line in enumerate(lines) if line]
+    n = max(1, min(PAGE_EDGE_LINES, len(filled) // 3))
+    return set(filled[:n] + filled[-n:])
+
+
+def normalize_text(text):
+    # whitespace, page numbers, running headers/footers and repeated blocks
+    if not text:
+        return ""
+
+    pages = [
+        [_INLINE_SPACE.sub(" ", _CONTROL.sub("", line)).strip() for line in page.splitlines()]
+        for page in text.split(PAGE_BREAK)
+    ]
+    edges = [_page_edges(lines) for lines in pages]
+
+    # short lines at the edge of three or more pages are running headers or footers
+    repeated = set()
+    if len(pages) >= RUNNING_MIN_PAGES:
+        counts = Counter()
+        for lines, edge in zip(pages, edges):
+            counts.update({lines[i] for i in edge if len(lines[i]) <= 80})
+        repeated = {line for line, n in counts.items() if n >= RUNNING_MIN_PAGES}
+
+    out = []
+    seen_long = set()
+    seen_repeated = set()
+    for lines, edge in zip(pages, edges):
+        for i, line in enumerate(lines):
+            if not line:
+                if out and out[-1] != "":
+                    out.append("")
+                continue
+            if i in edge:
+                if _is_page_number(line):
+                    continue
+                if line in repeated:
+                    if line in seen_repeated:
+                        continue
+                    seen_repeated.add(line)
+            # whole sentences extracted twice (text layer plus OCR, overlapping pages)
+            if len(line) >= 60:
+                if line in seen_long:
+                    continue
+                seen_long.add(line)
+            out.append(line)
+        if out and out[-1] != "":
+            out.append("")
+
+    return "\n".join(out).strip()
+
+
+def truncate_to_budget(text, max_tokens):
+    # cut at a line boundary so the model never sees half a sentence
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars]
+
+
+def build_evaluation_prompt(job_desc, resume, acceptance,
+                            resume_budget=PROMPT_RESUME_TOKEN_BUDGET,
+                            job_budget=PROMPT_JOB_TOKEN_BUDGET,
+                            job_profile_text=None):
+    # job_profile_text, when given, replaces the full job description (see job_profile.py)
+    no_description = job_desc == NO_DESCRIPTION
+
+    normalized_resume = normalize_text(resume)
+    clean_resume = truncate_to_budget(normalized_resume, resume_budget)
+
+    if no_description:
+        prompt = f"{EXTRACTION_INSTRUCTIONS}\nResume:\n{clean_resume}"
+        raw_tokens = estimate_tokens(EXTRACTION_INSTRUCTIONS) + estimate_tokens(resume)
+    else:
+        instructions = EVALUATION_INSTRUCTIONS.format(acceptance=acceptance)
+        if job_profile_text:
+            prompt = f"{instructions}\nJob Profile:\n{job_profile_text}\n\nResume:\n{clean_resume}"
+        else:
+            clean_job = truncate_to_budget(normalize_text(job_desc), job_budget)
+            prompt = f"{instructions}\nJob Description:\n{clean_job}\n\nResume:\n{clean_resume}"
+        raw_tokens = estimate_tokens(instructions) + estimate_tokens(job_desc) + estimate_tokens(resume)
+
+    prompt_tokens = estimate_tokens(prompt)
+    stats = {
+        "raw_tokens": raw_tokens,
+        "prompt_tokens": prompt_tokens,
+        "saved_tokens": max(0, raw_tokens - prompt_tokens),
+        "resume_truncated": len(clean_resume) < len(normalized_resume),
+    }
+    return prompt, stats
+
+
+def build_reformat_prompt(raw_output, fields, max_tokens=PROMPT_RESUME_TOKEN_BUDGET):
+    # the broken answer alone, without the resume, is enough to rebuild the JSON
+    return REFORMAT_INSTRUCTIONS.format(fields=", ".join(fields)) + truncate_to_budget(raw_output, max_tokens)
+
+
+def build_missing_fields_prompt(prompt, fields):
+    # same cached prefix and inputs, but only the missing fields are generated
+    return prompt + MISSING_FIELDS_INSTRUCTIONS.format(fields=", ".join(fields))
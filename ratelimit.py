@@ -0,0 +1,217 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import metrics
+
+# Provider rate limiter shared by every gunicorn worker on the host.
+# Each provider has two token buckets, requests per minute and tokens per minute,
+# kept in a small SQLite file so all worker processes draw from the same budget.
+# A call reserves its estimated tokens up front and settles against the usage the
+# provider reports; calls that do not fit wait (with jitter) instead of failing, and
+# a 429 that still gets through is retried with jittered exponential backoff.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "resume_ratelimit.sqlite3"))
+# 0 means no limit for that bucket
+LIMITS = {
+    "openai": {
+        "rpm": float(os.getenv("OPENAI_RPM", "500")),
+        "tpm": float(os.getenv("OPENAI_TPM", "200000")),
+    },
+    "gemini": {
+        "rpm": float(os.getenv("GEMINI_RPM", "300")),
+        "tpm": float(os.getenv("GEMINI_TPM", "1000000")),
+    },
+}
+# completion tokens reserved per call on top of the prompt estimate, settled afterwards
+OPENAI_OUTPUT_TOKENS = int(os.getenv("RATE_LIMIT_OPENAI_OUTPUT_TOKENS", "3000"))
+GEMINI_OUTPUT_TOKENS = int(os.getenv("RATE_LIMIT_GEMINI_OUTPUT_TOKENS", "1500"))
+# Gemini bills each image tile at a flat rate
+GEMINI_IMAGE_TOKENS = 258
+# longest a call queues for budget before it is sent anyway and left to the 429 retry
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "6"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+
+RETRYABLE_STATUS = (429, 503)
+RETRYABLE_ERRORS = ("RateLimitError", "ResourceExhausted", "TooManyRequests", "ServiceUnavailable")
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS buckets (
+        name        TEXT PRIMARY KEY,
+        available   REAL NOT NULL,
+        updated_at  REAL NOT NULL
+    )
+"""
+
+_local = threading.local()
+
+
+def _connection():
+    # sqlite connections must not cross threads or a fork
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(RATE_LIMIT_DB, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(CREATE_TABLE_SQL)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _refill(cursor, name, capacity, now):
+    row = cursor.execute("SELECT available, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return capacity
+    available, updated_at = row
+    # the bucket refills at capacity per minute and may be in debt after a settle
+    return min(capacity, available + max(0.0, now - updated_at) * capacity / 60.0)
+
+
+def _store(cursor, name, available, now):
+    cursor.execute("""
+        INSERT INTO buckets (name, available, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET available = excluded.available, updated_at = excluded.updated_at
+    """, (name, available, now))
+
+
+def _try_acquire(provider, tokens):
+    # returns 0 when the call may go now, else the seconds until it fits
+    limits = LIMITS[provider]
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        wanted = {"rpm": 1.0, "tpm": float(tokens)}
+        levels = {}
+        wait = 0.0
+        for kind, capacity in limits.items():
+            if capacity <= 0:
+                continue
+            # a call larger than the whole bucket would wait forever, let it drain the bucket instead
+            need = min(wanted[kind], capacity)
+            available = _refill(conn, f"{provider}:{kind}", capacity, now)
+            levels[kind] = (available, need, capacity)
+            if available < need:
+                wait = max(wait, (need - available) * 60.0 / capacity)
+
+        if wait == 0:
+            for kind, (available, need, capacity) in levels.items():
+                _store(conn, f"{provider}:{kind}", available - need, now)
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def acquire(provider, tokens):
+    if not RATE_LIMIT_ENABLED or provider not in LIMITS:
+        return
+    deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT
+    with metrics.stage(f"{provider}_throttle"):
+        while True:
+            try:
+                wait = _try_acquire(provider, tokens)
+            except sqlite3.Error as e:
+                # the limiter must never be the reason a call fails
+                print(f"⚠️ Rate limiter unavailable: {e}")
+                return
+            if wait == 0:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⚠️ {provider} rate limit wait exceeded {RATE_LIMIT_MAX_WAIT}s, sending anyway")
+                return
+            # jitter so queued callers in different workers do not wake in lockstep
+            time.sleep(min(remaining, wait * random.uniform(1.0, 1.5)))
+
+
+def settle(provider, estimated, actual):
+    # charge the difference between the reservation and the reported usage
+    if not RATE_LIMIT_ENABLED or provider not in LIMITS or actual is None:
+        return
+    capacity = LIMITS[provider]["tpm"]
+    if capacity <= 0:
+        return
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        name = f"{provider}:tpm"
+        available = _refill(conn, name, capacity, now)
+        _store(conn, name, available + min(estimated, capacity) - actual, now)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _drain(provider):
+    # a 429 means the provider sees more traffic than our budget, make every worker wait
+    if not RATE_LIMIT_ENABLED or provider not in LIMITS:
+        return
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for kind, capacity in LIMITS[provider].items():
+            if capacity > 0:
+                _store(conn, f"{provider}:{kind}", 0.0, now)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _status(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error):
+    return _status(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call(provider, fn, estimated_tokens, usage=None):
+    # fn() makes the provider call, usage(response) returns the tokens it reported
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        acquire(provider, estimated_tokens)
+        try:
+            response = fn()
+        except Exception as e:
+            if attempt >= RATE_LIMIT_RETRIES or not is_retryable(e):
+                raise
+            metrics.RATE_LIMIT_RETRIES.labels(provider=provider).inc()
+            try:
+                _drain(provider)
+            except sqlite3.Error:
+                pass
+            delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+            delay = max(_retry_after(e) or 0, random.uniform(delay / 2, delay))
+            print(f"⚠️ {provider} throttled ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if usage is not None:
+            try:
+                settle(provider, estimated_tokens, usage(response))
+            except sqlite3.Error as e:
+                print(f"⚠️ Rate limit settle failed: {e}")
+        return response
@@ -0,0 +1,179 @@
+import base64
+import json
+import os
+from decimal import Decimal
+
+from psycopg2.extras import RealDictCursor
+
+# Candidate search over the stored evaluations.
+# Filters compile to ILIKE '%term%' predicates served by the trigram indexes in
+# sql/002_candidate_search_indexes.sql. With a skill, title or company the matches
+# are ranked by a match score and paged with a keyset cursor on (score, candidate_id);
+# without one the owner's candidates are listed straight off the (owner_email,
+# candidate_id) index, so a page costs the same however many candidates there are.
+
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _like(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# years since the earliest recorded start, per candidate through the candidate_id index
+_YEARS_JOIN = """LEFT JOIN LATERAL (
+    SELECT EXTRACT(YEAR FROM now())::int - min(NULLIF(e.start_year, 0)) AS years
+    FROM candidate_experience e
+    WHERE e.candidate_id = {candidate_id}
+) y ON TRUE"""
+
+_COLUMNS = """c.candidate_id,
+    c.full_name,
+    c.candidate_email,
+    c.phone,
+    c.current_title,
+    c.current_company,
+    c.location,
+    c.resume_url"""
+
+
+def encode_cursor(score, candidate_id):
+    # score is None for the unranked listing, which pages on candidate_id alone
+    raw = json.dumps([None if score is None else str(score), str(candidate_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        score, candidate_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (None if score is None else Decimal(score)), candidate_id
+    except Exception as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def search_candidates(conn, owner_email, skills=None, title=None, company=None, location=None,
+                      min_years=None, limit=SEARCH_DEFAULT_LIMIT, cursor=None):
+    limit = max(1, min(limit or SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT))
+    skills = [s.strip() for s in (skills or []) if s and s.strip()]
+
+    params = {"owner": owner_email, "limit": limit + 1}
+    ctes = []
+    joins = []
+    where = ["c.owner_email = %(owner)s"]
+    score = []
+    matched_skills = "NULL::text[]"
+
+    if skills:
+        params["skill_patterns"] = [_like(s) for s in skills]
+        # matched through the trigram index on skill_name first, then narrowed to the owner
+        ctes.append("""sk AS (
+            SELECT s.candidate_id,
+                   count(DISTINCT lower(s.skill_name)) AS skills_matched,
+                   array_agg(DISTINCT s.skill_name) AS matched_skills
+            FROM candidate_skills s
+            JOIN candidates o ON o.candidate_id = s.candidate_id AND o.owner_email = %(owner)s
+            WHERE s.skill_name ILIKE ANY(%(skill_patterns)s)
+            GROUP BY s.candidate_id
+        )""")
+        joins.append("JOIN sk ON sk.candidate_id = c.candidate_id")
+        score.append("sk.skills_matched * 10")
+        matched_skills = "sk.matched_skills"
+
+    if title:
+        params["title"] = title
+        params["title_pattern"] = _like(title)
+        where.append("""(c.current_title ILIKE %(title_pattern)s OR EXISTS (
+            SELECT 1 FROM candidate_experience e
+            WHERE e.candidate_id = c.candidate_id AND e.title ILIKE %(title_pattern)s
+        ))""")
+        # the current title counts more than a past one
+        score.append("COALESCE(similarity(c.current_title, %(title)s), 0) * 5 + 1")
+
+    if company:
+        params["company_pattern"] = _like(company)
+        where.append("""(c.current_company ILIKE %(company_pattern)s OR EXISTS (
+            SELECT 1 FROM candidate_experience e
+            WHERE e.candidate_id = c.candidate_id AND e.company ILIKE %(company_pattern)s
+        ))""")
+        score.append("CASE WHEN c.current_company ILIKE %(company_pattern)s THEN 3 ELSE 1 END")
+
+    if location:
+        params["location_pattern"] = _like(location)
+        where.append("c.location ILIKE %(location_pattern)s")
+
+    # experience is only aggregated where it filters or ranks
+    ranked = bool(score)
+    if ranked or min_years is not None:
+        joins.append(_YEARS_JOIN.format(candidate_id="c.candidate_id"))
+    if min_years is not None:
+        params["min_years"] = min_years
+        where.append("y.years >= %(min_years)s")
+
+    after_score = None
+    if cursor:
+        after_score, params["after_id"] = decode_cursor(cursor)
+
+    if ranked:
+        # every match is scored before the page is cut, the filters above keep that set small
+        score.append("LEAST(COALESCE(y.years, 0), 30) * 0.1")
+        keyset = ""
+        if cursor:
+            if after_score is None:
+                raise InvalidCursor("Invalid cursor")
+            params["after_score"] = after_score
+            keyset = "WHERE (score, candidate_id) < (%(after_score)s, %(after_id)s)"
+        query = f"""
+            {"WITH " + ", ".join(ctes) if ctes else ""}
+            SELECT * FROM (
+                SELECT {_COLUMNS},
+                       y.years AS years_experience,
+                       {matched_skills} AS matched_skills,
+                       ROUND(({" + ".join(score)})::numeric, 4) AS score
+                FROM candidates c
+                {" ".join(joins)}
+                WHERE {" AND ".join(where)}
+            ) ranked
+            {keyset}
+            ORDER BY score DESC, candidate_id DESC
+            LIMIT %(limit)s
+        """
+    else:
+        # plain listing, walks the (owner_email, candidate_id) index and stops at the page;
+        # experience for the score is looked up for the rows of the page only
+        if cursor:
+            where.append("c.candidate_id < %(after_id)s")
+        query = f"""
+            SELECT page.*,
+                   y.years AS years_experience,
+                   NULL::text[] AS matched_skills,
+                   ROUND((LEAST(COALESCE(y.years, 0), 30) * 0.1)::numeric, 4) AS score
+            FROM (
+                SELECT {_COLUMNS}
+                FROM candidates c
+                {" ".join(joins)}
+                WHERE {" AND ".join(where)}
+                ORDER BY c.candidate_id DESC
+                LIMIT %(limit)s
+            ) page
+            {_YEARS_JOIN.format(candidate_id="page.candidate_id")}
+            ORDER BY page.candidate_id DESC
+        """
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"] if ranked else None, rows[-1]["candidate_id"])
+
+    for row in rows:
+        row["score"] = float(row["score"])
+
+    return {"items": rows, "next_cursor": next_cursor}
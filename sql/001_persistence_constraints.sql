@@ -0,0 +1,42 @@
+-- Unique constraints used by the ON CONFLICT upserts in persistence.py.
+-- Duplicates written by the old row-by-row path are removed first, keeping the oldest row.
+-- candidates is not de-duplicated here because other tables reference candidate_id; the old
+-- path looked the candidate up before inserting, so duplicates can only come from concurrent
+-- requests and have to be merged by hand if the index build below fails.
+
+BEGIN;
+
+CREATE UNIQUE INDEX IF NOT EXISTS candidates_owner_email_candidate_email_key
+    ON candidates (owner_email, candidate_email);
+
+DELETE FROM candidate_skills s
+USING candidate_skills d
+WHERE s.candidate_id = d.candidate_id
+  AND s.skill_name = d.skill_name
+  AND s.ctid > d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS candidate_skills_candidate_id_skill_name_key
+    ON candidate_skills (candidate_id, skill_name);
+
+DELETE FROM candidate_experience e
+USING candidate_experience d
+WHERE e.candidate_id = d.candidate_id
+  AND e.company = d.company
+  AND e.is_current = FALSE
+  AND d.is_current = FALSE
+  AND e.ctid > d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS candidate_experience_past_company_key
+    ON candidate_experience (candidate_id, company)
+    WHERE is_current = FALSE;
+
+DELETE FROM candidate_track t
+USING candidate_track d
+WHERE t.user_id = d.user_id
+  AND t.resume_id = d.resume_id
+  AND t.ctid > d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS candidate_track_user_id_resume_id_key
+    ON candidate_track (user_id, resume_id);
+
+COMMIT;
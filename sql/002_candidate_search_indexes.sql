@@ -0,0 +1,30 @@
+-- Indexes behind GET /candidates/search (search.py).
+-- Trigram GIN indexes serve the ILIKE '%term%' filters on skills, titles, companies and
+-- locations; the btree indexes serve the per-owner listing and the per-candidate lookups.
+-- On a large live database run each CREATE INDEX by hand with CONCURRENTLY instead.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS candidates_owner_email_candidate_id_idx
+    ON candidates (owner_email, candidate_id);
+
+CREATE INDEX IF NOT EXISTS candidates_current_title_trgm_idx
+    ON candidates USING gin (current_title gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS candidates_current_company_trgm_idx
+    ON candidates USING gin (current_company gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS candidates_location_trgm_idx
+    ON candidates USING gin (location gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS candidate_skills_skill_name_trgm_idx
+    ON candidate_skills USING gin (skill_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS candidate_experience_candidate_id_idx
+    ON candidate_experience (candidate_id);
+
+CREATE INDEX IF NOT EXISTS candidate_experience_title_trgm_idx
+    ON candidate_experience USING gin (title gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS candidate_experience_company_trgm_idx
+    ON candidate_experience USING gin (company gin_trgm_ops);
@@ -0,0 +1,83 @@
+import pytest
+
+from evaluation_schema import _balance, _scan, repair
+
+
+def test_valid_json_is_not_repaired():
+    assert repair('{"name": "Ann", "percentage_match": 80}') == ({"name": "Ann", "percentage_match": 80}, False)
+
+
+def test_fenced_output():
+    data, repaired = repair('```json\n{"name": "Ann", "skills": ["sql"]}\n```')
+    assert data == {"name": "Ann", "skills": ["sql"]}
+    assert repaired
+
+
+def test_truncated_mid_string():
+    data, repaired = repair('{"name": "Ann", "short_description": "Senior data eng')
+    assert data == {"name": "Ann", "short_description": "Senior data eng"}
+    assert repaired
+
+
+def test_truncated_mid_array():
+    data, _ = repair('{"name": "Ann", "skills": ["sql", "pyth')
+    assert data == {"name": "Ann", "skills": ["sql", "pyth"]}
+
+
+def test_truncated_after_comma_in_array():
+    data, _ = repair('{"name": "Ann", "skills": ["sql", ')
+    assert data == {"name": "Ann", "skills": ["sql"]}
+
+
+def test_truncated_after_colon():
+    data, _ = repair('{"name": "Ann", "percentage_match":')
+    assert data == {"name": "Ann", "percentage_match": None}
+
+
+def test_truncated_mid_key_drops_the_entry():
+    data, _ = repair('{"name": "Ann", "percentage_ma')
+    assert data == {"name": "Ann"}
+
+
+def test_brace_inside_string():
+    data, _ = repair('{"name": "Ann }", "short_description": "uses {braces}"} and then some')
+    assert data == {"name": "Ann }", "short_description": "uses {braces}"}
+
+
+def test_prose_after_the_object():
+    data, repaired = repair('Here is the evaluation:\n{"name": "Ann", "skills": ["sql",]}\nLet me know if you need more.')
+    assert data == {"name": "Ann", "skills": ["sql"]}
+    assert repaired
+
+
+def test_escaped_quote_at_the_cut():
+    data, _ = repair('{"name": "Ann \\"A\\')
+    assert data == {"name": 'Ann "A'}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "[1, 2, 3]", '"just a string"'])
+def test_unrepairable(text):
+    with pytest.raises(ValueError):
+        repair(text)
+
+
+def test_scan_skips_strings():
+    text = '{"a": "x, }", "b": [1, 2]} tail'
+    commas, end = _scan(text)
+    assert end == text.index("} tail")
+    assert commas == [text.index(', "b"'), text.index(", 2")]
+
+
+def test_scan_unclosed_object():
+    text = '{"a": {"b": 1}, "c": ['
+    commas, end = _scan(text)
+    assert end == -1
+    assert commas == [text.index(",")]
+
+
+def test_balance_closes_everything_open():
+    assert _balance('{"a": [{"b": "x') == '{"a": [{"b": "x"}]}'
+
+
+def test_balance_drops_trailing_commas():
+    assert _balance('{"a": [1, 2, ], "b": 3, }') == '{"a": [1, 2], "b": 3}'
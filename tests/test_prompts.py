@@ -0,0 +1,75 @@
+from prompts import PAGE_BREAK, _is_page_number, normalize_text
+
+
+def _page(i, total, body):
+    return "\n".join(["Jane Doe - Curriculum Vitae", *body, f"Page {i} of {total}"])
+
+
+def test_empty():
+    assert normalize_text("") == ""
+    assert normalize_text(None) == ""
+
+
+def test_whitespace_and_control_characters():
+    assert normalize_text("  Jane\t Doe \x07\n\n\n\nPython ") == "Jane Doe\n\nPython"
+
+
+def test_short_document_is_untouched():
+    text = "\n".join([
+        "Jane Doe",
+        "Data Engineer",
+        "+44 20 7946 0958",
+        "2019 - 2023",
+        "Data Engineer",
+        "2021",
+    ])
+    assert normalize_text(text) == text
+
+
+def test_page_numbers_and_running_header_at_page_edges():
+    bodies = [
+        ["Experience", "Acme Ltd, 2019 - 2023", "Built pipelines"],
+        ["Skills", "Python, SQL", "Spark"],
+        ["Education", "BSc Computer Science", "2015 - 2019"],
+        ["Languages", "English", "French"],
+    ]
+    text = PAGE_BREAK.join(_page(i, 4, body) for i, body in enumerate(bodies, 1))
+    lines = normalize_text(text).splitlines()
+    assert lines.count("Jane Doe - Curriculum Vitae") == 1
+    assert lines[0] == "Jane Doe - Curriculum Vitae"
+    assert not [line for line in lines if line.startswith("Page ")]
+    for body in bodies:
+        for line in body:
+            assert line in lines
+
+
+def test_numbers_inside_a_page_are_kept():
+    text = "\n".join(["Header", "Experience", "Acme Ltd", "3", "Page 3", "Built pipelines", "Led a team", "1"])
+    lines = normalize_text(text).splitlines()
+    # page numbers mid page stay, only the footer on the last line goes
+    assert "3" in lines
+    assert "Page 3" in lines
+    assert "1" not in lines
+
+
+def test_repeated_line_mid_page_is_kept():
+    pages = [
+        "\n".join(["Jane Doe", "Intro", "Data Engineer", "Data Engineer", "More", f"{i}"])
+        for i in range(1, 4)
+    ]
+    lines = normalize_text(PAGE_BREAK.join(pages)).splitlines()
+    assert lines.count("Data Engineer") == 6
+    assert lines.count("Jane Doe") == 1
+
+
+def test_long_lines_are_deduplicated():
+    sentence = "Designed and operated the company's streaming data platform on Kafka and Spark."
+    text = "\n".join(["Jane Doe", sentence, "Other", sentence])
+    assert normalize_text(text).splitlines().count(sentence) == 1
+
+
+def test_is_page_number():
+    for line in ["3", "Page 2", "page 2 of 5", "2/5", "2 / 5"]:
+        assert _is_page_number(line)
+    for line in ["2019", "6 of 5", "2019 - 2023", "+44 20 7946 0958", "Page two"]:
+        assert not _is_page_number(line)
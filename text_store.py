@@ -0,0 +1,123 @@
+import os
+import threading
+import traceback
+
+from db import ensure_schema, get_connection
+from memory_cache import MemoryLRU
+
+# Extraction does not depend on the job, so the text is stored once per document hash
+TEXT_STORE_ENABLED = os.getenv("TEXT_STORE_ENABLED", "true").lower() == "true"
+TEXT_STORE_MAX_ENTRIES = int(os.getenv("TEXT_STORE_MAX_ENTRIES", "256"))
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS document_text (
+        doc_hash       TEXT PRIMARY KEY,
+        extracted_text TEXT NOT NULL,
+        engine         TEXT NOT NULL,
+        gemini_tokens  INTEGER NOT NULL DEFAULT 0,
+        page_count     INTEGER,
+        created_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+        last_used_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+_lock = threading.Lock()
+_memory = MemoryLRU(TEXT_STORE_MAX_ENTRIES)  # doc_hash -> dict
+
+stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "puts": 0,
+    "errors": 0,
+    "gemini_tokens_saved": 0,
+}
+
+
+def _incr(name, amount=1):
+    with _lock:
+        stats[name] += amount
+
+
+def get(doc_hash):
+    if not TEXT_STORE_ENABLED:
+        return None
+
+    entry = _memory.get(doc_hash)
+    if entry is not None:
+        _incr("memory_hits")
+        _incr("gemini_tokens_saved", entry["gemini_tokens"])
+        return entry
+
+    try:
+        ensure_schema(CREATE_TABLE_SQL)
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE document_text
+                    SET last_used_at = now()
+                    WHERE doc_hash = %s
+                    RETURNING extracted_text, engine, gemini_tokens, page_count
+                """, (doc_hash,))
+                row = cursor.fetchone()
+    except Exception:
+        # a broken store only costs us a re-extraction
+        _incr("errors")
+        traceback.print_exc()
+        return None
+
+    if row is None:
+        _incr("misses")
+        return None
+
+    entry = {
+        "text": row[0],
+        "engine": row[1],
+        "gemini_tokens": row[2],
+        "page_count": row[3],
+    }
+    _memory.put(doc_hash, entry)
+    _incr("db_hits")
+    _incr("gemini_tokens_saved", entry["gemini_tokens"])
+    return entry
+
+
+def put(doc_hash, text, engine, gemini_tokens=0, page_count=None):
+    if not TEXT_STORE_ENABLED or not text:
+        return
+
+    entry = {
+        "text": text,
+        "engine": engine,
+        "gemini_tokens": gemini_tokens or 0,
+        "page_count": page_count,
+    }
+    _memory.put(doc_hash, entry)
+    _incr("puts")
+
+    try:
+        ensure_schema(CREATE_TABLE_SQL)
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO document_text (doc_hash, extracted_text, engine, gemini_tokens, page_count)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (doc_hash) DO UPDATE
+                    SET extracted_text = EXCLUDED.extracted_text,
+                        engine = EXCLUDED.engine,
+                        gemini_tokens = EXCLUDED.gemini_tokens,
+                        page_count = EXCLUDED.page_count,
+                        last_used_at = now()
+                """, (doc_hash, text, engine, entry["gemini_tokens"], page_count))
+    except Exception:
+        _incr("errors")
+        traceback.print_exc()
+
+
+def get_stats():
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["evictions"] = _memory.evictions
+    snapshot["memory_entries"] = len(_memory)
+    snapshot["enabled"] = TEXT_STORE_ENABLED
+    return snapshot
@@ -0,0 +1,88 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+# Client for the ResumeUpload API.
+# One keep-alive session per process, with timeouts and retries, and a small
+# thread pool so the upload runs while the resume is being extracted and evaluated.
+
+RESUME_UPLOAD_URL = os.getenv("RESUME_UPLOAD_URL", "http://webapifileupload.aiscreenmax.my/api/ResumeUpload/UploadFile")
+RESUME_UPLOAD_FOLDER = os.getenv("RESUME_UPLOAD_FOLDER", "dev")
+# inline: upload alongside the evaluation and store the url with it
+# background: answer without a url and fill it in once the upload finishes
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "inline").lower()
+UPLOAD_CONNECT_TIMEOUT = float(os.getenv("UPLOAD_CONNECT_TIMEOUT", "5"))
+UPLOAD_READ_TIMEOUT = float(os.getenv("UPLOAD_READ_TIMEOUT", "60"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+UPLOAD_MAX_WORKERS = int(os.getenv("UPLOAD_MAX_WORKERS", "8"))
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_pid = None
+
+
+def _init():
+    # session sockets and executor threads do not survive a gunicorn fork
+    global _session, _executor, _pid
+    with _lock:
+        if _pid != os.getpid():
+            retry = Retry(
+                total=UPLOAD_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["POST"]),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=UPLOAD_MAX_WORKERS,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            _session = session
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS, thread_name_prefix="upload")
+            _pid = os.getpid()
+
+
+def upload(file_bytes, filename):
+    _init()
+    with metrics.stage("upload"):
+        response = _session.post(
+            RESUME_UPLOAD_URL,
+            files={'file_url': (filename, file_bytes)},
+            data={"foldername": RESUME_UPLOAD_FOLDER},
+            timeout=(UPLOAD_CONNECT_TIMEOUT, UPLOAD_READ_TIMEOUT)
+        )
+        response.raise_for_status()
+
+    # Extract URL string
+    return response.text  # or response.json().get("url")
+
+
+def submit(fn, *args):
+    _init()
+    return _executor.submit(fn, *args)
+
+
+def _upload_then(upload_fn, file_bytes, filename, on_uploaded):
+    try:
+        on_uploaded(upload_fn(file_bytes, filename))
+    except Exception as e:
+        print(f"❌ Background upload failed for {filename}: {e}")
+        traceback.print_exc()
+
+
+def submit_background(upload_fn, file_bytes, filename, on_uploaded):
+    # fire and forget, on_uploaded receives the url
+    return submit(_upload_then, upload_fn, file_bytes, filename, on_uploaded)
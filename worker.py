@@ -0,0 +1,14 @@
+import argparse
+import os
+
+import jobs
+from flask1 import process_job
+
+# Standalone job worker: python worker.py --workers 4
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Process queued resume evaluations")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "4")))
+    args = parser.parse_args()
+
+    print(f"Starting {args.workers} job workers")
+    jobs.run_workers(process_job, args.workers)